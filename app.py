@@ -1,15 +1,20 @@
 # app.py
 import os
 import re
+import hmac
 import uuid
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI
-from models import CompareQuery, CompareResult, AgentQuery
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from models import CompareQuery, CompareResult, AgentQuery, validated_result
 from orchestrator import PriceCompareOrchestrator
 from providers.google_shopping import GoogleShoppingProvider
+from providers.http_pool import open_pool, close_pool
 from router.intent_router import detect_intent
-from recommender.recommend_agent import generate_recommendations
+from recommender.recommend_agent import generate_recommendations_async
 from profiler.audience_agent import generate_audience_profile
 from reporter.seasonal_report_agent import generate_seasonal_report
 
@@ -19,10 +24,30 @@ from runtime.executor import Executor
 from runtime.critic import simple_critic
 from runtime.trace import Trace
 from runtime.memory import mem
+from runtime import request_stats
+from providers.serp_cache import serp_cache
+from providers.hedging import hedge_policy
+from providers.resilience import guard_stats
+from providers.rate_limit import serpapi_bucket
+from providers.fx import fx_service
+from runtime.diagnostics import diag_ring
+from runtime.stage_metrics import stage_metrics
 from runtime.intent_decider import decide_intent   # 自动意图判断
-from tools_impl import TOOLS_IMPL
+from tools_impl import TOOLS_IMPL, orchestrator_for
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 进程级 HTTP 连接池（keep-alive / HTTP2），随应用启停
+    await open_pool()
+    # 汇率快照后台刷新（首轮刷新在启动时完成）
+    await fx_service.start()
+    try:
+        yield
+    finally:
+        await fx_service.stop()
+        await close_pool()
 
-app = FastAPI(title="AI Agent - OpenAI Cloud Version")
+app = FastAPI(title="AI Agent - OpenAI Cloud Version", lifespan=lifespan)
 SERVICE_VERSION = os.getenv("AGENT_SERVICE_VERSION", "0.2.0")
 SCHEMA_VERSION = "1.0"
 
@@ -31,8 +56,19 @@ providers = [GoogleShoppingProvider()]
 orc = PriceCompareOrchestrator(providers=providers)
 
 @app.post("/compare", response_model=CompareResult)
-async def compare(q: CompareQuery):
-    return await orc.run(q)
+async def compare(q: CompareQuery, response: Response):
+    request_stats.begin()
+    if q.prefs.get("providers"):
+        res = await orchestrator_for(q.prefs.get("providers"), q.prefs.get("synthetic")).run(q)
+    else:
+        res = await orc.run(q)
+    # 内部条目为快速构造（未校验），对外返回前统一校验一次
+    out = validated_result(res)
+    # 构造/校验开销随响应头返回，如 X-Items-Validate-Us-Per-Item（/agent 见 trace.metrics.items）
+    for k, v in _item_metrics().items():
+        if v is not None:
+            response.headers["X-Items-" + k.replace("_", "-").title()] = str(v)
+    return out
 
 # ====== 兼容 pydantic v1/v2 的安全导出 ======
 def _dump_model(obj):
@@ -178,6 +214,53 @@ def _clarification_check(text: str, intent: str, prefs: dict) -> dict:
 
     return {"need": bool(missing), "missing": missing, "questions": questions}
 
+def _serp_cache_metrics() -> dict:
+    """本次请求的 SerpAPI 缓存命中/未命中 + 进程累计统计"""
+    req = request_stats.snapshot("serp_cache.")
+    hits = int(req.get("hit_mem", 0) + req.get("hit_disk", 0))
+    return {
+        "hits": hits,
+        "misses": int(req.get("miss", 0)),
+        "hit_mem": int(req.get("hit_mem", 0)),
+        "hit_disk": int(req.get("hit_disk", 0)),
+        "lifetime": serp_cache.stats(),
+    }
+
+def _upstream_metrics() -> dict:
+    """本次请求的上游调用统计：合并（single-flight）与对冲（hedge）次数"""
+    return {
+        "singleflight": {k: int(v) for k, v in request_stats.snapshot("singleflight.").items()},
+        "hedge": {
+            "sent": int(request_stats.snapshot("hedge.").get("sent", 0)),
+            "won": int(request_stats.snapshot("hedge.").get("won", 0)),
+            "enabled": hedge_policy.enabled,
+        },
+    }
+
+def _serpapi_metrics() -> dict:
+    """SerpAPI 调用记账：本次请求按 endpoint 的真实上游调用数 + 本节点当日累计配额"""
+    req = request_stats.snapshot("serpapi.")
+    calls = {k[len("calls."):]: int(v) for k, v in req.items() if k.startswith("calls.")}
+    return {
+        "calls": calls,
+        "total_calls": sum(calls.values()),
+        "throttle_wait_ms": int(req.get("throttle_wait_ms", 0)),
+        "http_429": int(req.get("http_429", 0)),
+        "quota_today": serpapi_bucket.usage_cached(),
+    }
+
+def _item_metrics() -> dict:
+    """PriceItem 构造/校验开销：provider 快速构造 vs API 边界校验（微秒/条）"""
+    req = request_stats.snapshot("items.")
+    built, validated = int(req.get("built", 0)), int(req.get("validated", 0))
+    return {
+        "built": built,
+        "build_us_per_item": round(req.get("build_us", 0) / built, 2) if built else None,
+        "validated": validated,
+        "validate_us_per_item": round(req.get("validate_us", 0) / validated, 2) if validated else None,
+        "invalid": int(req.get("invalid", 0)),
+    }
+
 # --- 统一入口：Planner → Executor → Critic → Trace ---
 @app.post("/agent")
 async def agent_entry(q: AgentQuery):
@@ -188,6 +271,9 @@ async def agent_entry(q: AgentQuery):
     3. 执行 → 验证 → Trace 输出
     """
 
+    # 请求级计数器（缓存命中等），最终写入 trace.metrics
+    request_stats.begin()
+
     # 0) 会话级短期记忆（无需数据库）
     user_id = getattr(q, "user_id", None) or "anon"
     mem.update(user_id, "last_query", q.text)
@@ -273,6 +359,8 @@ async def agent_entry(q: AgentQuery):
     last_plan = None
     budget_exceeded = False
     steps_exceeded = False
+    # 执行预算按墙钟时间计：DAG 并发执行时各 span 的 latency 之和会高估实际耗时
+    exec_wall_ms = 0.0
     while True:
         r_query = RAgentQuery(
             intent=planner_intent,
@@ -283,7 +371,9 @@ async def agent_entry(q: AgentQuery):
         )
         plan = Planner.plan(r_query)
         last_plan = plan
+        t_exec = time.perf_counter()
         result_obj, runtime_trace = await executor.run_plan(plan, runtime_trace)
+        exec_wall_ms += (time.perf_counter() - t_exec) * 1000.0
         critique = simple_critic(result_obj, runtime_trace)
         attempt += 1
 
@@ -293,11 +383,7 @@ async def agent_entry(q: AgentQuery):
             steps_exceeded = True
             break
         if exec_budget_ms > 0:
-            try:
-                total_ms_now = sum(int(s.get("latency_ms") or 0) for s in step_dicts_now)
-            except Exception:
-                total_ms_now = 0
-            if total_ms_now >= exec_budget_ms:
+            if exec_wall_ms >= exec_budget_ms:
                 budget_exceeded = True
                 break
 
@@ -311,10 +397,11 @@ async def agent_entry(q: AgentQuery):
     # 6) 组装 Trace（以最终 plan/结果为准）
     # 统计执行指标
     step_dicts = runtime_trace.to_dict()
+    total_latency = int(exec_wall_ms)
     try:
-        total_latency = sum(int(s.get("latency_ms") or 0) for s in step_dicts)
+        span_latency_sum = sum(int(s.get("latency_ms") or 0) for s in step_dicts)
     except Exception:
-        total_latency = None
+        span_latency_sum = None
 
     highlevel_trace = {
         "plan": plan.rationale,
@@ -332,7 +419,12 @@ async def agent_entry(q: AgentQuery):
             "request_id": None,  # 稍后回填
             "service_version": SERVICE_VERSION,
             "total_latency_ms": total_latency,
+            "span_latency_sum_ms": span_latency_sum,
             "steps": len(step_dicts),
+            "serp_cache": _serp_cache_metrics(),
+            "upstream": _upstream_metrics(),
+            "serpapi": _serpapi_metrics(),
+            "items": _item_metrics(),
         },
     }
 
@@ -355,7 +447,9 @@ async def agent_entry(q: AgentQuery):
                 history=getattr(q, "history", None) or [],
             )
             alt_plan = Planner.plan(alt_query)
+            t_exec = time.perf_counter()
             alt_result, runtime_trace = await executor.run_plan(alt_plan, runtime_trace)
+            exec_wall_ms += (time.perf_counter() - t_exec) * 1000.0
             alt_crit = simple_critic(alt_result, runtime_trace)
             alt_items = getattr(alt_result, "items", []) or []
             if alt_crit.ok and len(alt_items) > 0:
@@ -369,10 +463,11 @@ async def agent_entry(q: AgentQuery):
         if not critique.ok:
             # 重新汇总 trace（包含回退尝试的步骤）
             step_dicts = runtime_trace.to_dict()
+            total_latency = int(exec_wall_ms)
             try:
-                total_latency = sum(int(s.get("latency_ms") or 0) for s in step_dicts)
+                span_latency_sum = sum(int(s.get("latency_ms") or 0) for s in step_dicts)
             except Exception:
-                total_latency = None
+                span_latency_sum = None
             highlevel_trace = {
                 "plan": plan.rationale,
                 "steps": [
@@ -389,7 +484,12 @@ async def agent_entry(q: AgentQuery):
                     "request_id": None,
                     "service_version": SERVICE_VERSION,
                     "total_latency_ms": total_latency,
+                    "span_latency_sum_ms": span_latency_sum,
                     "steps": len(step_dicts),
+                    "serp_cache": _serp_cache_metrics(),
+                    "upstream": _upstream_metrics(),
+                    "serpapi": _serpapi_metrics(),
+                    "items": _item_metrics(),
                 },
             }
             error_code = "validation_failed"
@@ -544,7 +644,29 @@ async def agent_entry(q: AgentQuery):
 
 @app.get("/health")
 async def health():
-    return {"ok": True, "service": "ai-agent", "version": SERVICE_VERSION}
+    return {"ok": True, "service": "ai-agent", "version": SERVICE_VERSION, "providers": guard_stats(), "fx": fx_service.stats(),
+            "serpapi_limiter": serpapi_bucket.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 文本格式：price_compare_full 各阶段耗时直方图 / 通过率（按 domain）"""
+    return PlainTextResponse(stage_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/diagnostics")
+async def admin_diagnostics(limit: int = 50, domain: Optional[str] = None,
+                            x_admin_token: Optional[str] = Header(None)):
+    """
+    抽样诊断（AGENT_DIAG_SAMPLE_RATE）。含用户查询原文与条目标题，默认关闭：
+    未配置 AGENT_ADMIN_TOKEN 时返回 404；配置后需带匹配的 X-Admin-Token。
+    """
+    token = os.getenv("AGENT_ADMIN_TOKEN", "")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(str(x_admin_token or ""), token):
+        raise HTTPException(status_code=403, detail="forbidden")
+    return {"stats": diag_ring.stats(), "entries": diag_ring.entries(limit=limit, domain=domain)}
 
 
 @app.get("/version")
@@ -557,7 +679,7 @@ async def version():
 
 @app.post("/agent/recommend")
 async def agent_recommend(q: AgentQuery):
-    rec = generate_recommendations(q.text)
+    rec = await generate_recommendations_async(q.text)
     trace = {
         "plan": "legacy: direct recommendation",
         "steps": [
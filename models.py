@@ -1,9 +1,11 @@
 # models.py
-from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional, Dict, Any, List
+import os
+import time
+from pydantic import BaseModel, HttpUrl, Field, ValidationError
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
-from typing import Any, Dict, Literal
-from pydantic import BaseModel
+
+from runtime import request_stats
 
 class CompareQuery(BaseModel):
     text: str                           # 如 "iPhone 15 Pro 256GB Blue"
@@ -31,11 +33,47 @@ class PriceItem(BaseModel):
     def total_cost(self) -> float:
         return self.price + self.shipping_cost + self.tax_cost
 
+# ====== provider 内部可信数据的快速构造（跳过校验），对外在 API 边界统一校验一次 ======
+_TRUSTED_ITEMS = str(os.getenv("AGENT_TRUSTED_ITEMS", "1")).lower() in ("1", "true", "yes")
+
+def trusted_item(**fields) -> PriceItem:
+    """
+    provider 内部使用：字段已清洗（safe_url / parse_price），直接构造不做校验（url 保持 str）。
+    AGENT_TRUSTED_ITEMS=0 时退回完整校验。
+    """
+    if not _TRUSTED_ITEMS:
+        return PriceItem(**fields)
+    if hasattr(PriceItem, "model_construct"):
+        return PriceItem.model_construct(**fields)
+    return PriceItem.construct(**fields)
+
+def item_fields(it: Any) -> Dict[str, Any]:
+    """读取条目字段（浅拷贝）。不走 serializer：快速构造的对象 url 为 str，model_dump 会告警。"""
+    if isinstance(it, dict):
+        return dict(it)
+    d = getattr(it, "__dict__", None)
+    if d is not None:
+        return dict(d)
+    return it.model_dump() if hasattr(it, "model_dump") else it.dict()
+
+def replace_item(it: PriceItem, **update) -> PriceItem:
+    """不校验的浅拷贝 + 字段替换（兼容 v1/v2）"""
+    if hasattr(it, "model_copy"):
+        return it.model_copy(update=update)
+    return it.copy(update=update)
+
+def validate_item(it: Any) -> PriceItem:
+    if hasattr(PriceItem, "model_validate"):
+        return PriceItem.model_validate(item_fields(it))
+    return PriceItem(**item_fields(it))
+
 class CompareResult(BaseModel):
     items: List[PriceItem]
     deduped: int
     filtered: int
     citations: List[Dict[str, str]] = []      # 可选：来源链接 [{title,url}]
+    timed_out: List[str] = []                 # 截止时间内未返回的 provider
+    failed: Dict[str, str] = {}               # provider -> 错误摘要
 
 
 class AgentQuery(BaseModel):
@@ -55,3 +93,27 @@ class AgentQuery(BaseModel):
         "populate_by_name": True,
         "from_attributes": True,
     }
+
+
+def validated_result(res: CompareResult) -> CompareResult:
+    """
+    API 边界：对最终条目做一次完整校验（快速构造路径只在内部使用）。
+    单条校验失败（URL/价格畸形等）只丢弃该条并计数，不影响其余条目。
+    """
+    t0 = time.perf_counter()
+    items: List[PriceItem] = []
+    invalid = 0
+    for it in res.items:
+        try:
+            items.append(validate_item(it))
+        except ValidationError as e:
+            invalid += 1
+            err = (e.errors() or [{}])[0]
+            print(f"[ITEMS] dropped invalid item from {getattr(it, 'source', '?')}: {err.get('loc')} {err.get('msg')}")
+    if invalid:
+        request_stats.incr("items.invalid", invalid)
+    request_stats.incr("items.validated", len(items))
+    request_stats.incr("items.validate_us", int((time.perf_counter() - t0) * 1e6))
+    if hasattr(res, "model_copy"):
+        return res.model_copy(update={"items": items})
+    return res.copy(update={"items": items})
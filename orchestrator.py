@@ -1,13 +1,18 @@
 # orchestrator.py
-from typing import List, Dict, Tuple
-from models import CompareQuery, CompareResult, PriceItem
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, List, Dict, Tuple, Optional
+from models import CompareQuery, CompareResult, PriceItem, replace_item
+from providers.base import ProviderUnavailable
+from providers.resilience import guard_for
+from ranking import top_k
+from providers.fx import DEFAULT_FX, current_fx  # noqa: F401  (DEFAULT_FX 保留旧导入路径)
 
-# 简单汇率表（需要可接真实 FX）
-DEFAULT_FX: Dict[Tuple[str, str], float] = {
-    ("AUD", "AUD"): 1.0,
-    ("USD", "AUD"): 1.48,
-    ("EUR", "AUD"): 1.62,
-}
+try:
+    import numpy as np
+except ImportError:  # 可选依赖：缺失时只走逐条路径
+    np = None
 
 def normalize_currency(items: List[PriceItem], fx: Dict[Tuple[str,str], float], target: str) -> List[PriceItem]:
     out: List[PriceItem] = []
@@ -15,12 +20,13 @@ def normalize_currency(items: List[PriceItem], fx: Dict[Tuple[str,str], float],
         if it.currency != target:
             rate = fx.get((it.currency, target))
             if rate:
-                it = it.copy(update={
-                    "price": round(it.price * rate, 2),
-                    "shipping_cost": round(it.shipping_cost * rate, 2),
-                    "tax_cost": round(it.tax_cost * rate, 2),
-                    "currency": target
-                })
+                it = replace_item(
+                    it,
+                    price=round(it.price * rate, 2),
+                    shipping_cost=round(it.shipping_cost * rate, 2),
+                    tax_cost=round(it.tax_cost * rate, 2),
+                    currency=target,
+                )
         out.append(it)
     return out
 
@@ -48,25 +54,259 @@ def policy_filter(items: List[PriceItem]) -> List[PriceItem]:
         ans.append(it)
     return ans
 
-def sort_items(items: List[PriceItem]) -> List[PriceItem]:
-    # 主：总拥有成本；次：评分高优先
+def sort_items(items: List[PriceItem], k: Optional[int] = None) -> List[PriceItem]:
+    # 主：总拥有成本；次：评分高优先。给定 k 时只保留前 k（有界堆，O(n log k)）
+    if k is not None:
+        return top_k(items, k, "best_total_cost")
     return sorted(items, key=lambda x: (x.total_cost, -(x.seller_rating or 0.0)))
 
+def columnar_pipeline(items: List[PriceItem], fx: Dict[Tuple[str, str], float], target: str,
+                      only_new: bool, topn: int) -> Tuple[List[PriceItem], int, int]:
+    """
+    列式批处理版 normalize_currency → deduplicate → policy_filter → sort_items → only_new → TopN：
+    价格/运费/税/评分/币种码/去重键码各成一列 NumPy 数组，
+    FX 为向量乘法，去重为 groupby-min，过滤为掩码，排序为一次 lexsort（TopN 先 argpartition 预选），
+    只对最终 TopN 条目物化 PriceItem。结果与逐条路径一致。
+    返回 (items, deduped, filtered)。
+    """
+    n = len(items)
+    if n == 0:
+        return [], 0, 0
+
+    cur_codes: Dict[str, int] = {}
+    key_codes: Dict[str, int] = {}
+    cur = np.fromiter((cur_codes.setdefault(it.currency, len(cur_codes)) for it in items), np.int64, n)
+    key = np.fromiter((key_codes.setdefault(canonical_key(it), len(key_codes)) for it in items), np.int64, n)
+    price = np.fromiter((it.price for it in items), np.float64, n)
+    ship = np.fromiter((it.shipping_cost for it in items), np.float64, n)
+    tax = np.fromiter((it.tax_cost for it in items), np.float64, n)
+    rating = np.fromiter((np.nan if it.seller_rating is None else it.seller_rating for it in items), np.float64, n)
+
+    # 1) FX：每个币种一个汇率（目标币种/无汇率 → 不换算）
+    rates = np.ones(len(cur_codes))
+    convert = np.zeros(len(cur_codes), dtype=bool)
+    for c, code in cur_codes.items():
+        if c != target:
+            r = fx.get((c, target))
+            if r:
+                rates[code], convert[code] = r, True
+    conv = convert[cur]
+    rate = rates[cur]
+    total = np.where(conv, np.round(price * rate, 2) + np.round(ship * rate, 2) + np.round(tax * rate, 2),
+                     price + ship + tax)
+
+    # 2) 去重：按 (key, total, 原序) 排序，每个 key 取第一条（最便宜，平价取先到者）
+    pos = np.arange(n)
+    order = np.lexsort((pos, total, key))
+    k_sorted = key[order]
+    head = np.ones(n, dtype=bool)
+    head[1:] = k_sorted[1:] != k_sorted[:-1]
+    kept = order[head]
+    deduped = n - len(kept)
+    # 逐条路径的 dict 顺序 = key 首次出现的位置；用作排序的最终平局键
+    _, first_pos = np.unique(key, return_index=True)
+    key_first = first_pos[key]
+
+    # 3) 策略过滤（掩码）
+    r_k = rating[kept]
+    mask = (total[kept] > 0) & (np.isnan(r_k) | (r_k >= 3.0))
+    filtered = int(len(kept) - mask.sum())
+    sel = kept[mask]
+
+    # 4) 只要全新
+    if only_new and len(sel):
+        is_new = np.fromiter((items[i].condition.lower() == "new" for i in sel), bool, len(sel))
+        sel = sel[is_new]
+
+    # 5) TopN：argpartition 预选（保留边界平价项），再对候选做一次 lexsort
+    topn = max(0, int(topn))
+    if 0 < topn < len(sel):
+        t_sel = total[sel]
+        kth = np.partition(t_sel, topn - 1)[topn - 1]
+        sel = sel[t_sel <= kth]
+    rank = np.lexsort((key_first[sel], -np.nan_to_num(rating[sel], nan=0.0), total[sel]))
+    top = sel[rank][:topn]
+
+    out: List[PriceItem] = []
+    for i in top.tolist():
+        it = items[i]
+        if conv[i]:
+            r = float(rate[i])
+            it = replace_item(
+                it,
+                price=round(it.price * r, 2),
+                shipping_cost=round(it.shipping_cost * r, 2),
+                tax_cost=round(it.tax_cost * r, 2),
+                currency=target,
+            )
+        out.append(it)
+    return out, deduped, filtered
+
+def _use_columnar(q: CompareQuery, n: int) -> bool:
+    if np is None:
+        return False
+    flag = q.prefs.get("columnar")
+    if flag is not None:
+        return bool(flag)
+    try:
+        threshold = int(os.getenv("AGENT_COLUMNAR_MIN_ITEMS", "256"))
+    except Exception:
+        threshold = 256
+    return threshold > 0 and n >= threshold
+
 class PriceCompareOrchestrator:
     def __init__(self, providers: List, fx_rates: Dict[Tuple[str,str], float] = None):
         self.providers = providers
-        self.fx = fx_rates or DEFAULT_FX
+        # 未显式传入汇率表时，每次 run 读取后台刷新的最新快照
+        self.fx = fx_rates
+
+    @staticmethod
+    def _deadline_s(q: CompareQuery) -> Optional[float]:
+        """prefs.deadline_ms 优先，其次 AGENT_PROVIDER_DEADLINE_MS；<=0 表示不设截止时间"""
+        try:
+            ms = float(q.prefs.get("deadline_ms") or os.getenv("AGENT_PROVIDER_DEADLINE_MS", "0") or 0)
+        except Exception:
+            ms = 0.0
+        return ms / 1000.0 if ms > 0 else None
 
-    async def run(self, q: CompareQuery) -> CompareResult:
-        # 1) 并发检索
-        import asyncio
-        tasks = [p.search(q, q.prefs.get("max_results", 20)) for p in self.providers]
-        results_nested = await asyncio.gather(*tasks)
+    @staticmethod
+    def _guard_enabled() -> bool:
+        return str(os.getenv("AGENT_BREAKER", "1")).lower() in ("1", "true", "yes")
+
+    async def _guarded_search(self, p, q: CompareQuery, limit: int) -> List[PriceItem]:
+        """熔断 + 自适应并发：不健康或过载时快速失败，不再堆积协程/连接"""
+        if not self._guard_enabled():
+            return await p.search(q, limit)
+        name = getattr(p, "name", type(p).__name__)
+        guard = guard_for(name)
+        reason = guard.acquire()
+        if reason:
+            raise ProviderUnavailable(f"{name}: {reason}")
+        t0 = time.monotonic()
+        try:
+            res = await p.search(q, limit)
+        except asyncio.CancelledError:
+            guard.on_cancel()
+            raise
+        except Exception:
+            guard.on_failure()
+            raise
+        guard.on_success(time.monotonic() - t0)
+        return res
+
+    async def _fan_out(self, q: CompareQuery, limit: int, deadline_s: Optional[float]):
+        """并发调用各 provider；截止时间到仍未返回的取消并记为 timed_out，异常记为 failed。"""
+        tasks = [(getattr(p, "name", type(p).__name__), asyncio.ensure_future(self._guarded_search(p, q, limit)))
+                 for p in self.providers]
+        if not tasks:
+            return [], [], {}
+        _, pending = await asyncio.wait([t for _, t in tasks], timeout=deadline_s)
+
+        results_nested: List[List[PriceItem]] = []
+        timed_out: List[str] = []
+        failed: Dict[str, str] = {}
+        errors: List[BaseException] = []
+        for name, t in tasks:   # 按 provider 顺序收集，保证结果顺序稳定
+            if t in pending:
+                if self._guard_enabled():
+                    guard_for(name).on_timeout()
+                t.cancel()
+                timed_out.append(name)
+                continue
+            if t.cancelled():
+                failed[name] = "cancelled"
+                continue
+            exc = t.exception()
+            if exc is not None:
+                failed[name] = f"{type(exc).__name__}: {exc}"[:300]
+                errors.append(exc)
+                continue
+            results_nested.append(t.result())
+
+        if timed_out or failed:
+            print(f"[ORC] partial fan-out: timed_out={timed_out} failed={list(failed)}")
+        # 全部 provider 都报错（无超时、无成功）时保持原有行为：向上抛出
+        if errors and not results_nested and not timed_out:
+            raise errors[0]
+        return results_nested, timed_out, failed
+
+    async def stream(self, q: CompareQuery, deadline_s: Optional[float] = None,
+                     issues: Optional[Dict[str, Any]] = None) -> AsyncIterator[PriceItem]:
+        """
+        流式模式：哪个 provider 先返回就先产出它的条目（逐条做 FX → 策略过滤 → only_new）。
+        不做 canonical_key 去重 / 排序 / TopN —— 交给调用方的增量阶段（如 profile.dedup_key）。
+        调用方提前结束迭代（break / aclose）时，仍在进行的 provider 请求会被取消。
+        issues（可选）会被填入 {"timed_out": [...], "failed": {...}}。
+        """
+        if deadline_s is None:
+            deadline_s = self._deadline_s(q)
+        issues = issues if issues is not None else {}
+        timed_out: List[str] = issues.setdefault("timed_out", [])
+        failed: Dict[str, str] = issues.setdefault("failed", {})
+        fx = self.fx if self.fx is not None else current_fx()
+        only_new = bool(q.prefs.get("only_new"))
+        limit = q.prefs.get("max_results", 20)
+
+        tasks = {asyncio.ensure_future(self._guarded_search(p, q, limit)): getattr(p, "name", type(p).__name__)
+                 for p in self.providers}
+        pending = set(tasks)
+        deadline = None if deadline_s is None else time.monotonic() + deadline_s
+        errors: List[BaseException] = []
+        succeeded = 0
+        try:
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break   # 截止时间到
+                for t in done:
+                    name = tasks[t]
+                    if t.cancelled():
+                        failed[name] = "cancelled"
+                        continue
+                    exc = t.exception()
+                    if exc is not None:
+                        failed[name] = f"{type(exc).__name__}: {exc}"[:300]
+                        errors.append(exc)
+                        continue
+                    succeeded += 1
+                    batch = policy_filter(normalize_currency(t.result(), fx, q.currency))
+                    for it in batch:
+                        if only_new and it.condition.lower() != "new":
+                            continue
+                        yield it
+            for t in (t for t in tasks if t in pending):   # 按 provider 顺序记录
+                timed_out.append(tasks[t])
+                if self._guard_enabled():
+                    guard_for(tasks[t]).on_timeout()
+        finally:
+            # 正常结束时 pending 已为空；提前退出 / 超时则取消剩余请求
+            for t in pending:
+                t.cancel()
+
+        if timed_out or failed:
+            print(f"[ORC] partial stream: timed_out={timed_out} failed={list(failed)}")
+        if errors and not succeeded and not timed_out:
+            raise errors[0]
+
+    async def run(self, q: CompareQuery, deadline_s: Optional[float] = None) -> CompareResult:
+        # 1) 并发检索（可选截止时间：返回已完成 provider 的部分结果）
+        if deadline_s is None:
+            deadline_s = self._deadline_s(q)
+        results_nested, timed_out, failed = await self._fan_out(q, q.prefs.get("max_results", 20), deadline_s)
         items = [it for sub in results_nested for it in sub]
         print(f"[ORC] fetched {len(items)} raw items from providers")
 
+        topn = int(q.prefs.get("max_results", 10))
+        fx = self.fx if self.fx is not None else current_fx()
+        if _use_columnar(q, len(items)):
+            items, deduped, filtered = columnar_pipeline(
+                items, fx, q.currency, bool(q.prefs.get("only_new")), topn)
+            return CompareResult(items=items, deduped=deduped, filtered=filtered,
+                                 timed_out=timed_out, failed=failed)
+
         # 2) 币种归一化
-        items = normalize_currency(items, self.fx, q.currency)
+        items = normalize_currency(items, fx, q.currency)
 
         # 3) 去重
         before = len(items)
@@ -78,15 +318,12 @@ class PriceCompareOrchestrator:
         items = policy_filter(items)
         filtered = before2 - len(items)
 
-        # 5) 排序
-        items = sort_items(items)
-
-        # 6) 偏好过滤（如只要全新）
+        # 5) 偏好过滤（如只要全新）
         if q.prefs.get("only_new"):
             items = [i for i in items if i.condition.lower() == "new"]
 
-        # 7) TopN
-        topn = int(q.prefs.get("max_results", 10))
-        items = items[:topn]
+        # 6) 排序 + TopN（只保留前 topn，不做全量排序）
+        items = sort_items(items, k=topn)
 
-        return CompareResult(items=items, deduped=deduped, filtered=filtered)
+        return CompareResult(items=items, deduped=deduped, filtered=filtered,
+                             timed_out=timed_out, failed=failed)
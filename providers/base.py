@@ -3,6 +3,10 @@ from typing import List
 from abc import ABC, abstractmethod
 from models import PriceItem, CompareQuery
 
+class ProviderUnavailable(RuntimeError):
+    """provider 被熔断或并发已满时快速失败（不发起上游请求）"""
+    pass
+
 class ProviderBase(ABC):
     name: str = "base"
 
@@ -0,0 +1,247 @@
+# providers/fx.py
+import os
+import json
+import time
+import asyncio
+import httpx
+from typing import Any, Dict, Optional, Tuple
+
+from providers.http_pool import get_client
+
+# 静态兜底汇率（数据源不可用 / 尚未刷新时使用）
+# 需覆盖 google_shopping.parse_price 可能产出的全部币种（AUD/USD/EUR/GBP/JPY）
+DEFAULT_FX: Dict[Tuple[str, str], float] = {
+    ("AUD", "AUD"): 1.0,
+    ("USD", "AUD"): 1.48,
+    ("EUR", "AUD"): 1.62,
+    ("GBP", "AUD"): 1.90,
+    ("JPY", "AUD"): 0.0100,
+}
+
+# 区域 → 当地币种：搜索结果里不带币种符号的价格（如 extracted_price）按搜索区域标注
+REGION_CURRENCY: Dict[str, str] = {
+    "AU": "AUD", "US": "USD", "GB": "GBP", "UK": "GBP", "JP": "JPY",
+    "DE": "EUR", "FR": "EUR", "IT": "EUR", "ES": "EUR", "NL": "EUR", "IE": "EUR",
+}
+
+
+def region_currency(region: Optional[str], default: str = "USD") -> str:
+    """未知区域按 default（google_shopping 对未知区域按美国站搜索）"""
+    return REGION_CURRENCY.get(str(region or "").upper(), default)
+
+
+class FxSnapshot:
+    """
+    不可变汇率快照：所有币种相对基准币种的价值 → 稠密汇率矩阵（含交叉汇率）。
+    读路径只做两次 dict 查找 + 一次矩阵索引，无锁、无 I/O。
+    兼容旧的 Dict[(src, tgt)] 接口：支持 .get((src, tgt)) / [(src, tgt)] / in。
+    """
+    __slots__ = ("base", "currencies", "index", "matrix", "version", "source", "fetched_at")
+
+    def __init__(self, base: str, values: Dict[str, float], version: int = 0,
+                 source: str = "static", fetched_at: Optional[float] = None):
+        # values[c] = 1 单位 c 折合多少基准币种
+        vals = {str(c).upper(): float(v) for c, v in values.items() if v and float(v) > 0}
+        vals[base] = 1.0
+        currencies = tuple(sorted(vals))
+        self.base = base
+        self.currencies = currencies
+        self.index = {c: i for i, c in enumerate(currencies)}
+        self.matrix = tuple(tuple(vals[s] / vals[t] for t in currencies) for s in currencies)
+        self.version = version
+        self.source = source
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    def rate(self, src: str, tgt: str) -> Optional[float]:
+        i = self.index.get(src)
+        j = self.index.get(tgt)
+        if i is None or j is None:
+            return None
+        return self.matrix[i][j]
+
+    def get(self, pair: Tuple[str, str], default: Optional[float] = None) -> Optional[float]:
+        r = self.rate(pair[0], pair[1])
+        return default if r is None else r
+
+    def __getitem__(self, pair: Tuple[str, str]) -> float:
+        r = self.rate(pair[0], pair[1])
+        if r is None:
+            raise KeyError(pair)
+        return r
+
+    def __contains__(self, pair) -> bool:
+        return self.rate(pair[0], pair[1]) is not None
+
+    def convert(self, amount: float, src: str, tgt: str) -> Optional[float]:
+        r = self.rate(src, tgt)
+        return None if r is None else round(amount * r, 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base": self.base,
+            "currencies": len(self.currencies),
+            "version": self.version,
+            "source": self.source,
+            "age_s": round(time.time() - self.fetched_at, 1),
+        }
+
+
+def values_from_pairs(pairs: Dict[Tuple[str, str], float], base: str) -> Dict[str, float]:
+    """
+    (src, tgt) → rate（1 src = rate tgt）形式的表 → 相对基准币种的价值。
+    沿报价链传递（如 base=USD 时 EUR→AUD→USD），所以报价不必直接对 base。
+    """
+    base = base.upper()
+    quotes = [(str(s).upper(), str(t).upper(), float(r)) for (s, t), r in pairs.items() if r and float(r) > 0]
+    out: Dict[str, float] = {base: 1.0}
+    changed = True
+    while changed:
+        changed = False
+        for src, tgt, r in quotes:
+            if tgt in out and src not in out:
+                out[src] = r * out[tgt]; changed = True
+            elif src in out and tgt not in out:
+                out[tgt] = out[src] / r; changed = True
+    return out
+
+
+def values_from_payload(data: Dict[str, Any], base: str) -> Dict[str, float]:
+    """
+    解析常见的汇率 JSON：{"base": "USD", "rates": {"AUD": 1.48, ...}}（1 base = rates[c] 单位 c），
+    再换算到我们的基准币种。
+    """
+    src_base = str(data.get("base") or base).upper()
+    rates = {str(c).upper(): float(v) for c, v in (data.get("rates") or {}).items() if v}
+    rates[src_base] = 1.0
+    if base not in rates:
+        raise ValueError(f"fx payload has no rate for base {base}")
+    # 1 单位 c = (1 / rates[c]) src_base = rates[base] / rates[c] base
+    return {c: rates[base] / r for c, r in rates.items() if r > 0}
+
+
+class StaticFxSource:
+    name = "static"
+
+    def __init__(self, pairs: Optional[Dict[Tuple[str, str], float]] = None):
+        self.pairs = pairs or DEFAULT_FX
+
+    async def load(self, base: str) -> Dict[str, float]:
+        return values_from_pairs(self.pairs, base)
+
+
+class FileFxSource:
+    """本地 JSON 文件（由运维/定时任务写入）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"file:{path}"
+
+    def _read(self) -> Dict[str, Any]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def load(self, base: str) -> Dict[str, float]:
+        data = await asyncio.to_thread(self._read)
+        return values_from_payload(data, base)
+
+
+class HttpFxSource:
+    """HTTP 汇率接口（或本地 stub server），复用进程级连接池"""
+
+    def __init__(self, url: str, timeout_s: float = 10.0):
+        self.url = url
+        self.timeout_s = timeout_s
+        self.name = f"http:{url}"
+
+    async def load(self, base: str) -> Dict[str, float]:
+        client = get_client()
+        if client is not None:
+            r = await client.get(self.url, timeout=self.timeout_s)
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout_s) as c:
+                r = await c.get(self.url)
+        r.raise_for_status()
+        return values_from_payload(r.json(), base)
+
+
+def source_from_env():
+    spec = (os.getenv("AGENT_FX_SOURCE") or "static").strip()
+    if spec.lower() == "static":
+        return StaticFxSource()
+    if spec.startswith(("http://", "https://")):
+        return HttpFxSource(spec)
+    return FileFxSource(spec[5:] if spec.startswith("file:") else spec)
+
+
+class FxService:
+    """
+    后台刷新的汇率服务：
+    - 刷新任务周期性从 source 拉取，构建新的 FxSnapshot 后整体替换引用（读者永远看到完整快照）
+    - 刷新失败保留上一份快照；从未成功时使用 DEFAULT_FX
+    - 数据源缺少的币种用静态表补齐（同一基准下）
+    """
+
+    def __init__(self, source=None, base: str = "AUD", refresh_s: float = 3600.0):
+        self.source = source or StaticFxSource()
+        self.base = base.upper()
+        self.refresh_s = max(1.0, float(refresh_s))
+        self._fallback = values_from_pairs(DEFAULT_FX, self.base)
+        self._snapshot = FxSnapshot(self.base, self._fallback, version=0, source="static")
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"refresh_ok": 0, "refresh_error": 0}
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "FxService":
+        try:
+            refresh_s = float(os.getenv("AGENT_FX_REFRESH_S", "3600"))
+        except Exception:
+            refresh_s = 3600.0
+        return cls(source=source_from_env(), base=os.getenv("AGENT_FX_BASE", "AUD"), refresh_s=refresh_s)
+
+    def snapshot(self) -> FxSnapshot:
+        return self._snapshot
+
+    async def refresh(self) -> bool:
+        try:
+            values = await self.source.load(self.base)
+        except Exception as e:
+            self.counters["refresh_error"] += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"[FX] refresh failed ({getattr(self.source, 'name', 'source')}): {self.last_error}")
+            return False
+        merged = {**self._fallback, **values}
+        self._snapshot = FxSnapshot(self.base, merged, version=self._snapshot.version + 1,
+                                    source=getattr(self.source, "name", "source"))
+        self.counters["refresh_ok"] += 1
+        self.last_error = None
+        return True
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_s)
+            await self.refresh()
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._snapshot.stats(), **self.counters, "last_error": self.last_error}
+
+
+fx_service = FxService.from_env()
+
+
+def current_fx() -> FxSnapshot:
+    return fx_service.snapshot()
@@ -1,14 +1,23 @@
 # providers/google_shopping.py
-import os, httpx, re
+import os, re, math, time, asyncio
 from typing import List, Tuple
 from datetime import datetime
 from urllib.parse import urlsplit, urlunsplit, quote
 from dotenv import load_dotenv
-from models import CompareQuery, PriceItem
+from models import CompareQuery, PriceItem, trusted_item
+from providers.serpapi import search_json, search_stream
+from providers.fx import region_currency
+from runtime import request_stats
 
 load_dotenv()
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
 
+# 区域 → SerpAPI location；未列出的区域按美国站搜索（与 fx.region_currency 的默认一致）
+REGION_LOCATION = {
+    "AU": "Australia", "US": "United States", "GB": "United Kingdom", "UK": "United Kingdom",
+    "JP": "Japan", "DE": "Germany", "FR": "France", "IT": "Italy", "ES": "Spain",
+    "NL": "Netherlands", "IE": "Ireland",
+}
 CURRENCY_MAP = {
     "A$":"AUD","AU$":"AUD","$":"USD","US$":"USD","€":"EUR","£":"GBP","¥":"JPY"
 }
@@ -50,9 +59,78 @@ def parse_price(price_raw, fallback_currency: str) -> Tuple[float, str] | None:
         nums = [float(m.group(1))]
     return min(nums), cur
 
+# 流式模式下只向 SerpAPI 请求映射需要的字段（json_restrictor）
+RESTRICT_FIELDS = (
+    "error,shopping_results[].{title,link,product_link,source,merchant,extracted_price,price,"
+    "prices,condition,second_hand_condition}"
+)
+
+def item_price(it: dict, fallback_currency: str) -> Tuple[float, str] | None:
+    """单条 shopping_result 的价格：优先 extracted_price，否则 price 字符串，再兜底 prices 列表"""
+    parsed = parse_price(it.get("extracted_price", it.get("price")), fallback_currency)
+    if not parsed:
+        for p in (it.get("prices") or []):
+            parsed = parse_price(p.get("extracted_price", p.get("price")), fallback_currency)
+            if parsed: break
+    return parsed
+
+def _stream_enabled(q: CompareQuery) -> bool:
+    flag = q.prefs.get("stream_parse")
+    if flag is None:
+        flag = os.getenv("AGENT_SERP_STREAM", "0")
+    return str(flag).lower() in ("1", "true", "yes")
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except Exception:
+        return default
+
 class GoogleShoppingProvider:
     name = "google_shopping"
 
+    async def _fetch_page(self, params: dict, q: CompareQuery, limit: int) -> List[dict]:
+        if _stream_enabled(q):
+            # 增量解析，凑够 limit 条有价格的结果即停止读取响应
+            params = {**params, "json_restrictor": RESTRICT_FIELDS}
+            results = await search_stream(params, endpoint=self.name, limit=limit,
+                                          accept=lambda it: item_price(it, q.currency) is not None)
+            print(f"[SERPAPI] query='{q.text}' start={params.get('start', 0)}, streamed {len(results)} priced results")
+            return results
+        data = await search_json(params, endpoint=self.name)
+        results = data.get("shopping_results") or []
+        print(f"[SERPAPI] query='{q.text}' start={params.get('start', 0)}, got {len(results)} results, error={data.get('error')}")
+        return results[:limit]
+
+    async def _fetch_results(self, params: dict, q: CompareQuery, limit: int) -> List[dict]:
+        """limit 超过单页容量时按 start 偏移并发抓取多页，按页序合并（去掉跨页重复）"""
+        page_size = _env_int("AGENT_SERP_PAGE_SIZE", 40)
+        pages = min(_env_int("AGENT_SERP_MAX_PAGES", 4), math.ceil(max(1, limit) / page_size))
+        if pages <= 1:
+            return await self._fetch_page(params, q, limit)
+
+        pages_res = await asyncio.gather(
+            *[self._fetch_page({**params, "start": i * page_size, "num": page_size}, q, page_size)
+              for i in range(pages)],
+            return_exceptions=True,
+        )
+        merged: List[dict] = []
+        seen = set()
+        for i, res in enumerate(pages_res):
+            if isinstance(res, BaseException):
+                if i == 0:
+                    raise res
+                # 后续页失败：保留之前的页，保证顺序一致
+                print(f"[SERPAPI] page {i} error: {res}")
+                break
+            for it in res:
+                key = (it.get("title"), it.get("link") or it.get("product_link"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(it)
+        return merged[:limit]
+
     async def search(self, q: CompareQuery, limit: int = 12) -> List[PriceItem]:
         if not SERPAPI_KEY:
             raise RuntimeError("SERPAPI_KEY not set. Put it in .env")
@@ -60,21 +138,16 @@ class GoogleShoppingProvider:
         params = {
             "engine": "google_shopping",
             "q": q.text,
-            "location": "Australia" if q.region == "AU" else "United States",
+            "location": REGION_LOCATION.get(str(q.region or "").upper(), "United States"),
             "hl": "en",
             "api_key": SERPAPI_KEY
         }
 
-        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=6.0)) as client:
-            r = await client.get("https://serpapi.com/search.json", params=params)
-            r.raise_for_status()
-            data = r.json()
-
-        results = data.get("shopping_results") or []
-        print(f"[SERPAPI] query='{q.text}', got {len(results)} results, error={data.get('error')}")
+        results = await self._fetch_results(params, q, limit)
 
         items: List[PriceItem] = []
-        for it in results[:limit]:
+        t0 = time.perf_counter()
+        for it in results:
             try:
                 title = it.get("title") or q.text
                 # Google 有时没有商家直链（link），只有 product_link（带空格）：
@@ -83,14 +156,8 @@ class GoogleShoppingProvider:
 
                 source = it.get("source") or it.get("merchant") or "unknown"
 
-                # 价格优先用 extracted_price，否则解析 price 字符串
-                price_raw = it.get("extracted_price", it.get("price"))
-                parsed = parse_price(price_raw, q.currency)
-                if not parsed:
-                    # 再兜底：个别在 'prices' 列表
-                    for p in (it.get("prices") or []):
-                        parsed = parse_price(p.get("extracted_price", p.get("price")), q.currency)
-                        if parsed: break
+                # 无币种符号的价格是搜索区域的当地币种，而不是请求的目标币种（由 orchestrator 统一换算）
+                parsed = item_price(it, region_currency(q.region))
                 if not parsed:
                     # 打印一条诊断但继续处理后续条目
                     print(f"[SERPAPI] skip (no price): {title}")
@@ -98,7 +165,7 @@ class GoogleShoppingProvider:
 
                 price_val, currency = parsed
 
-                items.append(PriceItem(
+                items.append(trusted_item(
                     title=title,
                     brand=None, model=None, variant=None,
                     price=price_val, currency=currency,
@@ -111,5 +178,7 @@ class GoogleShoppingProvider:
                 # 单条异常不影响全局；打印诊断即可
                 print(f"[SERPAPI] item error: {e}")
 
+        request_stats.incr("items.built", len(items))
+        request_stats.incr("items.build_us", int((time.perf_counter() - t0) * 1e6))
         print(f"[SERPAPI] mapped {len(items)} items")
         return items
@@ -0,0 +1,132 @@
+# providers/hedging.py
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from runtime import request_stats
+
+
+class LatencyHistogram:
+    """滚动窗口延迟样本（秒），用于估计最近的 p90/p95 等分位数。"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=max(1, int(window)))
+
+    def record(self, latency_s: float) -> None:
+        self._samples.append(float(latency_s))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        xs = sorted(self._samples)
+        idx = min(len(xs) - 1, max(0, int(round(p * (len(xs) - 1)))))
+        return xs[idx]
+
+
+class HedgePolicy:
+    """
+    对冲请求：主请求超过该 provider 最近延迟的 percentile 仍未返回时，再发一份副本，先成功者胜出。
+    - 预算：每个主请求积累 budget 个 token，副本消耗 1 个 → 额外调用占比不超过 budget
+    - 样本不足 min_samples 时不对冲
+    """
+
+    def __init__(self, enabled: bool = False, percentile: float = 0.9, budget: float = 0.1,
+                 min_samples: int = 20, window: int = 200, min_delay_s: float = 0.05):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = max(0.0, budget)
+        self.min_samples = max(1, int(min_samples))
+        self.window = window
+        self.min_delay_s = min_delay_s
+        self._hist: Dict[str, LatencyHistogram] = {}
+        self._tokens = 0.0
+        self.counters = {"primary": 0, "hedged": 0, "hedge_won": 0}
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        enabled = str(os.getenv("AGENT_HEDGE", "0")).lower() in ("1", "true", "yes")
+        try:
+            return cls(
+                enabled=enabled,
+                percentile=float(os.getenv("AGENT_HEDGE_PERCENTILE", "0.9")),
+                budget=float(os.getenv("AGENT_HEDGE_BUDGET", "0.1")),
+                min_samples=int(os.getenv("AGENT_HEDGE_MIN_SAMPLES", "20")),
+            )
+        except Exception:
+            return cls(enabled=enabled)
+
+    def histogram(self, key: str) -> LatencyHistogram:
+        h = self._hist.get(key)
+        if h is None:
+            h = self._hist[key] = LatencyHistogram(self.window)
+        return h
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        h = self.histogram(key)
+        if len(h) < self.min_samples:
+            return None
+        p = h.percentile(self.percentile)
+        return None if p is None else max(self.min_delay_s, p)
+
+    def _take_token(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 factory()；必要时对冲。factory 每次调用须返回一个新的 awaitable。"""
+        hist = self.histogram(key)
+        if not self.enabled:
+            t0 = time.monotonic()
+            res = await factory()
+            hist.record(time.monotonic() - t0)
+            return res
+
+        self.counters["primary"] += 1
+        self._tokens = min(self._tokens + self.budget, 10.0)
+        delay = self.hedge_delay(key)
+
+        started: Dict["asyncio.Future", float] = {}
+        primary = asyncio.ensure_future(factory())
+        started[primary] = time.monotonic()
+        pending = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self._take_token():
+                    hedge = asyncio.ensure_future(factory())
+                    started[hedge] = time.monotonic()
+                    pending.add(hedge)
+                    self.counters["hedged"] += 1
+                    request_stats.incr("hedge.sent")
+
+            last_exc: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        hist.record(time.monotonic() - started[t])
+                        if t is not primary:
+                            self.counters["hedge_won"] += 1
+                            request_stats.incr("hedge.won")
+                        return t.result()
+                    last_exc = t.exception()
+            raise last_exc  # 两路都失败：抛出最后一个错误
+        finally:
+            for t in pending:
+                t.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "delay_s": {k: self.hedge_delay(k) for k in self._hist},
+        }
+
+
+hedge_policy = HedgePolicy.from_env()
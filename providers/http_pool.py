@@ -0,0 +1,67 @@
+# providers/http_pool.py
+import os
+import httpx
+from typing import Optional
+
+# 进程级共享连接池：由 FastAPI lifespan 打开/关闭，provider 复用 keep-alive 连接，
+# 避免每轮查询都重新做 TCP+TLS 握手。
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _http2_enabled() -> bool:
+    if str(os.getenv("AGENT_HTTP2", "1")).lower() not in ("1", "true", "yes"):
+        return False
+    # HTTP/2 需要 h2 包（pip install httpx[http2]）；缺失时退回 HTTP/1.1
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=_env_int("AGENT_HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int("AGENT_HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("AGENT_HTTP_KEEPALIVE_EXPIRY_S", 30.0),
+    )
+    timeout = httpx.Timeout(
+        _env_float("AGENT_HTTP_TIMEOUT_S", 15.0),
+        connect=_env_float("AGENT_HTTP_CONNECT_TIMEOUT_S", 6.0),
+    )
+    return httpx.AsyncClient(http2=_http2_enabled(), limits=limits, timeout=timeout)
+
+
+async def open_pool() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+
+async def close_pool() -> None:
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def get_client() -> Optional[httpx.AsyncClient]:
+    """返回共享连接池；未在 lifespan 中打开（如脚本直接调用）时返回 None。"""
+    if _client is None or _client.is_closed:
+        return None
+    return _client
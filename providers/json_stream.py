@@ -0,0 +1,57 @@
+# providers/json_stream.py
+import json
+import codecs
+from typing import Any, AsyncIterator, Dict
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\r\n"
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    从流式 JSON 响应中增量解析顶层 "key": [ ... ] 数组的元素，逐个 yield。
+    只解析该数组本身（其它字段只做字符串查找），调用方可随时 break 提前结束。
+    """
+    needle = f'"{key}"'
+    dec = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    in_array = False
+
+    async for chunk in chunks:
+        buf += dec.decode(chunk)
+
+        if not in_array:
+            idx = buf.find(needle)
+            if idx < 0:
+                buf = buf[-len(needle):]     # 只保留可能跨块的尾巴
+                continue
+            j = idx + len(needle)
+            while j < len(buf) and buf[j] in _WS:
+                j += 1
+            if j < len(buf) and buf[j] == ":":
+                j += 1
+                while j < len(buf) and buf[j] in _WS:
+                    j += 1
+            if j >= len(buf):
+                buf = buf[idx:]              # 数据不够判断，等下一块
+                continue
+            if buf[j] != "[":
+                return                       # 不是数组（如 null）
+            buf, pos, in_array = buf[j + 1:], 0, True
+
+        while True:
+            while pos < len(buf) and (buf[pos] in _WS or buf[pos] == ","):
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                obj, end = _DECODER.raw_decode(buf, pos)
+            except ValueError:
+                break                        # 元素不完整，等下一块
+            pos = end
+            if isinstance(obj, dict):
+                yield obj
+        buf, pos = buf[pos:], 0
@@ -0,0 +1,195 @@
+# providers/rate_limit.py
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from providers.base import ProviderUnavailable
+
+
+class RateLimited(ProviderUnavailable):
+    """在等待上限内拿不到令牌（本地限流），未发起上游请求"""
+    pass
+
+
+class SharedTokenBucket:
+    """
+    令牌桶 + 配额记账，状态存放在本机 SQLite 文件里，
+    同一节点上的多个 uvicorn worker 共享同一个桶（BEGIN IMMEDIATE 保证原子性）。
+    rate_per_s <= 0 时不限流，只记账。
+
+    - SQLite 操作不在事件循环上执行（acquire 走线程池，记账为 fire-and-forget）
+    - busy 超时很短；共享存储出错（如 database is locked）时退化为进程内令牌桶（fail-open 到本地限流）
+    """
+
+    def __init__(self, path: str, rate_per_s: float = 5.0, burst: float = 10.0, name: str = "serpapi",
+                 busy_timeout_s: float = 0.25, usage_ttl_s: float = 10.0):
+        self.path = path
+        self.rate = float(rate_per_s)
+        self.burst = max(1.0, float(burst))
+        self.name = name
+        self.busy_timeout_s = max(0.0, float(busy_timeout_s))
+        self.usage_ttl_s = float(usage_ttl_s)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        # 进程内后备桶（共享存储不可用时使用）
+        self._local_tokens = self.burst
+        self._local_updated = time.time()
+        self._usage: Dict[str, int] = {}
+        self._usage_at = 0.0
+        self._usage_refreshing = False
+        self.counters = {"store_errors": 0, "local_fallback": 0}
+
+    @classmethod
+    def from_env(cls) -> "SharedTokenBucket":
+        try:
+            rate = float(os.getenv("AGENT_SERPAPI_RATE_PER_S", "5"))
+            burst = float(os.getenv("AGENT_SERPAPI_BURST", "10"))
+            busy = float(os.getenv("AGENT_SERPAPI_LIMITER_BUSY_S", "0.25"))
+        except Exception:
+            rate, burst, busy = 5.0, 10.0, 0.25
+        path = os.getenv("AGENT_SERPAPI_LIMITER_PATH", ".cache/serpapi_limiter.sqlite")
+        return cls(path=path, rate_per_s=rate, burst=burst, busy_timeout_s=busy)
+
+    def _conn(self) -> sqlite3.Connection:
+        # fork 之后必须重新连接
+        if self._db is None or self._pid != os.getpid():
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS quota (day TEXT, endpoint TEXT, calls INTEGER, "
+                       "PRIMARY KEY (day, endpoint))")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _try_take(self, n: float = 1.0) -> float:
+        """尝试取 n 个令牌；成功返回 0，否则返回建议等待秒数（共享存储出错时走进程内后备桶）"""
+        if self.rate <= 0:
+            return 0.0
+        try:
+            return self._shared_take(n)
+        except Exception as e:
+            self.counters["store_errors"] += 1
+            if self.counters["store_errors"] == 1 or self.counters["store_errors"] % 100 == 0:
+                print(f"[RATE-LIMIT] shared bucket unavailable, using local bucket: {e}")
+            return self._local_take(n)
+
+    def _local_take(self, n: float) -> float:
+        with self._lock:
+            self.counters["local_fallback"] += 1
+            now = time.time()
+            tokens = min(self.burst, self._local_tokens + max(0.0, now - self._local_updated) * self.rate)
+            wait = 0.0
+            if tokens >= n:
+                tokens -= n
+            else:
+                wait = (n - tokens) / self.rate
+            self._local_tokens, self._local_updated = tokens, now
+        return wait
+
+    def _shared_take(self, n: float) -> float:
+        with self._lock:
+            db = self._conn()
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT tokens, updated FROM bucket WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                wait = 0.0
+                if tokens >= n:
+                    tokens -= n
+                else:
+                    wait = (n - tokens) / self.rate
+                db.execute("INSERT OR REPLACE INTO bucket (name, tokens, updated) VALUES (?, ?, ?)",
+                           (self.name, tokens, now))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self, max_wait_s: float = 5.0) -> float:
+        """异步等待令牌；返回实际等待秒数，超过 max_wait_s 抛 RateLimited"""
+        if self.rate <= 0:
+            return 0.0
+        t0 = time.monotonic()
+        while True:
+            wait = await asyncio.to_thread(self._try_take)
+            if wait <= 0:
+                return time.monotonic() - t0
+            if time.monotonic() - t0 + wait > max_wait_s:
+                raise RateLimited(f"{self.name}: local rate limit ({self.rate}/s) exceeded")
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, max_wait_s: float = 5.0) -> float:
+        t0 = time.monotonic()
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return time.monotonic() - t0
+            if time.monotonic() - t0 + wait > max_wait_s:
+                raise RateLimited(f"{self.name}: local rate limit ({self.rate}/s) exceeded")
+            time.sleep(wait)
+
+    def record_call(self, endpoint: str) -> None:
+        """按天/按 endpoint 记账（跨 worker 累计），用于配额核对"""
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        try:
+            with self._lock:
+                self._conn().execute(
+                    "INSERT INTO quota (day, endpoint, calls) VALUES (?, ?, 1) "
+                    "ON CONFLICT(day, endpoint) DO UPDATE SET calls = calls + 1", (day, endpoint))
+        except Exception as e:
+            self.counters["store_errors"] += 1
+            print(f"[RATE-LIMIT] quota write error: {e}")
+
+    def record_call_nowait(self, endpoint: str) -> None:
+        """在事件循环上时把记账写交给线程池（不等待）；否则同步写"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.record_call(endpoint)
+            return
+        loop.run_in_executor(None, self.record_call, endpoint)
+
+    def usage(self, day: Optional[str] = None) -> Dict[str, int]:
+        day = day or datetime.utcnow().strftime("%Y-%m-%d")
+        try:
+            with self._lock:
+                rows = self._conn().execute("SELECT endpoint, calls FROM quota WHERE day = ?", (day,)).fetchall()
+        except Exception:
+            return {}
+        return {ep: int(n) for ep, n in rows}
+
+    def usage_cached(self) -> Dict[str, int]:
+        """
+        当日配额的缓存快照（供每个响应的 metrics 使用，不阻塞）：
+        过期后在线程池里刷新，本次先返回旧值。
+        """
+        if time.time() - self._usage_at >= self.usage_ttl_s and not self._usage_refreshing:
+            self._usage_refreshing = True
+
+            def refresh() -> None:
+                try:
+                    self._usage = self.usage()
+                    self._usage_at = time.time()
+                finally:
+                    self._usage_refreshing = False
+            try:
+                asyncio.get_running_loop().run_in_executor(None, refresh)
+            except RuntimeError:
+                refresh()
+        return dict(self._usage)
+
+    def stats(self) -> Dict[str, float]:
+        return {"rate_per_s": self.rate, "burst": self.burst, **self.counters}
+
+
+serpapi_bucket = SharedTokenBucket.from_env()
@@ -0,0 +1,92 @@
+# providers/registry.py
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from providers.google_shopping import GoogleShoppingProvider
+from providers.mock_shop_a import MockShopA
+from providers.mock_shop_b import MockShopB
+from providers.synthetic import SyntheticProvider, sanitize_config
+
+# name -> factory(config) ；prefs.providers 里的名字在这里解析成 provider 实例
+_FACTORIES: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+DEFAULT_PROVIDERS = ["google_shopping"]
+
+
+def register_provider(name: str, factory: Callable[[Dict[str, Any]], Any]) -> None:
+    _FACTORIES[name] = factory
+
+
+def synthetic_enabled() -> bool:
+    """合成 provider 仅用于压测：AGENT_SYNTHETIC_PROVIDERS=1 时才接受客户端的 synthetic 名字"""
+    return str(os.getenv("AGENT_SYNTHETIC_PROVIDERS", "0")).lower() in ("1", "true", "yes")
+
+
+def _synthetic_max_providers() -> int:
+    try:
+        return max(1, int(os.getenv("AGENT_SYNTHETIC_MAX_PROVIDERS", "8")))
+    except Exception:
+        return 8
+
+
+def available_providers() -> List[str]:
+    return sorted(_FACTORIES) + (["synthetic:<N>"] if synthetic_enabled() else [])
+
+
+def normalize_request(names: Optional[List[str]], config: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    归一化客户端的 providers + 合成参数（用作 orchestrator 缓存 key）：
+    名字小写去空白；未启用合成 provider 时丢弃 synthetic 名字；合成参数限幅，且仅在有合成 provider 时保留。
+    """
+    out: List[str] = []
+    for raw in names or []:
+        name = str(raw or "").strip().lower()
+        if name.startswith("synthetic"):
+            if not synthetic_enabled():
+                print(f"[PROVIDERS] synthetic providers disabled, '{raw}' ignored")
+                continue
+            _, _, n = name.partition(":")
+            try:
+                count = max(1, int(n)) if n else 1
+            except ValueError:
+                count = 1
+            name = f"synthetic:{min(count, _synthetic_max_providers())}"
+        out.append(name)
+    has_synthetic = any(n.startswith("synthetic") for n in out)
+    return out, (sanitize_config(config) if has_synthetic else {})
+
+
+def resolve_providers(names: Optional[List[str]], config: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """
+    把名字列表解析成 provider 实例：
+      - "google_shopping"/"google"、"mock_a"、"mock_b"
+      - "synthetic" 或 "synthetic:N" → N 个合成 provider（synthetic_00..），参数取 config
+        （需 AGENT_SYNTHETIC_PROVIDERS=1；N ≤ AGENT_SYNTHETIC_MAX_PROVIDERS，参数限幅）
+    未知名字忽略；全部无效时回退到 DEFAULT_PROVIDERS。
+    """
+    names, cfg = normalize_request(names, config)
+    out: List[Any] = []
+    for name in names:
+        if name.startswith("synthetic"):
+            _, _, n = name.partition(":")
+            try:
+                count = max(1, int(n)) if n else 1
+            except ValueError:
+                count = 1
+            out.extend(SyntheticProvider.from_config(f"synthetic_{i:02d}", cfg) for i in range(count))
+            continue
+        factory = _FACTORIES.get(name)
+        if factory is None:
+            print(f"[PROVIDERS] unknown provider '{name}', ignored")
+            continue
+        out.append(factory(cfg))
+    if not out:
+        out = [_FACTORIES[n](cfg) for n in DEFAULT_PROVIDERS]
+    return out
+
+
+_google = GoogleShoppingProvider()
+register_provider("google_shopping", lambda cfg: _google)
+register_provider("google", lambda cfg: _google)
+register_provider("mock_a", lambda cfg: MockShopA())
+register_provider("mock_b", lambda cfg: MockShopB())
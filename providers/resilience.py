@@ -0,0 +1,162 @@
+# providers/resilience.py
+import os
+import time
+from typing import Any, Dict
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class CircuitBreaker:
+    """
+    closed → (连续失败 >= failure_threshold) → open
+    open   → (reset_timeout_s 后) → half_open：只放行 half_open_max 个探测请求
+    half_open → 探测成功 → closed；探测失败 → open
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0, half_open_max: int = 1):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_s = float(reset_timeout_s)
+        self.half_open_max = max(1, int(half_open_max))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout_s:
+                return False
+            self.state, self.probes = self.HALF_OPEN, 0
+        if self.state == self.HALF_OPEN:
+            if self.probes >= self.half_open_max:
+                return False
+            self.probes += 1
+        return True
+
+    def record_success(self) -> None:
+        self.state, self.failures, self.probes = self.CLOSED, 0, 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state, self.opened_at, self.probes = self.OPEN, time.monotonic(), 0
+
+    def release_probe(self) -> None:
+        # 探测请求被取消（非健康信号）：归还名额
+        if self.state == self.HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 在途并发上限：成功（且未超过目标延迟）加性增长 +1/limit，失败/超时/过慢乘性回退。
+    在途数达到上限时直接拒绝，而不是排队堆积协程。
+    """
+
+    def __init__(self, initial: float = 16, min_limit: float = 1, max_limit: float = 64,
+                 backoff: float = 0.5, target_latency_s: float = 0.0):
+        self.min_limit = max(1.0, float(min_limit))
+        self.max_limit = max(self.min_limit, float(max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial)))
+        self.backoff = backoff
+        self.target_latency_s = target_latency_s
+        self.inflight = 0
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self) -> None:
+        self.inflight = max(0, self.inflight - 1)
+
+    def on_success(self, latency_s: float) -> None:
+        self.release()
+        if self.target_latency_s > 0 and latency_s > self.target_latency_s:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_failure(self) -> None:
+        self.release()
+        self._decrease()
+
+    def _decrease(self) -> None:
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+class ProviderGuard:
+    """单个 provider 的熔断器 + 自适应并发限制"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(_env_float("AGENT_BREAKER_FAILURES", 5)),
+            reset_timeout_s=_env_float("AGENT_BREAKER_RESET_S", 30.0),
+        )
+        self.limiter = AdaptiveLimiter(
+            initial=_env_float("AGENT_LIMIT_INITIAL", 16),
+            min_limit=_env_float("AGENT_LIMIT_MIN", 1),
+            max_limit=_env_float("AGENT_LIMIT_MAX", 64),
+            target_latency_s=_env_float("AGENT_LIMIT_TARGET_MS", 0) / 1000.0,
+        )
+        self.rejected = 0
+
+    def acquire(self) -> str:
+        """返回空串表示放行；否则返回拒绝原因"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            return "circuit open"
+        if not self.limiter.try_acquire():
+            self.breaker.release_probe()
+            self.rejected += 1
+            return "concurrency limit reached"
+        return ""
+
+    def on_success(self, latency_s: float) -> None:
+        self.limiter.on_success(latency_s)
+        self.breaker.record_success()
+
+    def on_failure(self) -> None:
+        self.limiter.on_failure()
+        self.breaker.record_failure()
+
+    def on_timeout(self) -> None:
+        # 截止时间到仍未返回：记为失败并回退并发上限（在途名额由随后的取消归还）
+        self.limiter._decrease()
+        self.breaker.record_failure()
+
+    def on_cancel(self) -> None:
+        # 调用方主动取消（提前结束等），不作为健康信号
+        self.limiter.release()
+        self.breaker.release_probe()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "limit": round(self.limiter.limit, 2),
+            "inflight": self.limiter.inflight,
+            "rejected": self.rejected,
+        }
+
+
+_GUARDS: Dict[str, ProviderGuard] = {}
+
+
+def guard_for(name: str) -> ProviderGuard:
+    g = _GUARDS.get(name)
+    if g is None:
+        g = _GUARDS[name] = ProviderGuard(name)
+    return g
+
+
+def guard_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: g.stats() for name, g in _GUARDS.items()}
@@ -0,0 +1,189 @@
+# providers/serp_cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from runtime import request_stats
+
+# 两级缓存：进程内 LRU（有上限） + 本地 SQLite（跨进程/重启持久）
+# 缓存的是 SerpAPI 原始 JSON；调用方只读，不要原地修改返回值。
+
+
+def normalize_query(q: str) -> str:
+    return re.sub(r"\s+", " ", (q or "").strip().lower())
+
+
+def make_key(engine: str, q: str, location: Optional[str] = None,
+             gl: Optional[str] = None, hl: Optional[str] = None, **extra: Any) -> str:
+    """(engine, 归一化 q, location, gl, hl) + 其它影响结果的参数（num/start 等） → 稳定 key"""
+    payload = {
+        "engine": (engine or "").lower(),
+        "q": normalize_query(q),
+        "location": (location or "").lower(),
+        "gl": (gl or "").lower(),
+        "hl": (hl or "").lower(),
+        "extra": {k: str(v) for k, v in sorted(extra.items()) if k != "api_key" and v is not None},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SerpCache:
+    def __init__(self, max_entries: int = 512, ttl_s: float = 900.0, path: str = "", enabled: bool = True):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.path = path
+        self.enabled = enabled
+        self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()        # 只保护内存层
+        self._disk_lock = threading.Lock()   # 串行化 SQLite 连接（在线程池中使用）
+        self._db: Optional[sqlite3.Connection] = None
+        self._sets = 0
+        self.counters = {"hit_mem": 0, "hit_disk": 0, "miss": 0, "set": 0}
+
+    @classmethod
+    def from_env(cls) -> "SerpCache":
+        try:
+            size = int(os.getenv("AGENT_SERP_CACHE_SIZE", "512"))
+            ttl = float(os.getenv("AGENT_SERP_CACHE_TTL_S", "900"))
+        except Exception:
+            size, ttl = 512, 900.0
+        enabled = str(os.getenv("AGENT_SERP_CACHE", "1")).lower() in ("1", "true", "yes")
+        path = os.getenv("AGENT_SERP_CACHE_PATH", ".cache/serp_cache.sqlite")
+        return cls(max_entries=size, ttl_s=ttl, path=path, enabled=enabled)
+
+    # ---------- 磁盘层 ----------
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._db is None:
+            try:
+                d = os.path.dirname(self.path)
+                if d:
+                    os.makedirs(d, exist_ok=True)
+                db = sqlite3.connect(self.path, timeout=2.0, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS serp_cache (key TEXT PRIMARY KEY, expires REAL, value TEXT)")
+                db.commit()
+                self._db = db
+            except Exception as e:
+                print(f"[SERP-CACHE] disk tier disabled: {e}")
+                self.path = ""
+                return None
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._disk_lock:
+            db = self._conn()
+            if db is None:
+                return None
+            try:
+                row = db.execute("SELECT expires, value FROM serp_cache WHERE key = ?", (key,)).fetchone()
+            except Exception:
+                return None
+        if not row or row[0] < now:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_set(self, key: str, expires: float, value: Dict[str, Any]) -> None:
+        with self._disk_lock:
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.execute("INSERT OR REPLACE INTO serp_cache (key, expires, value) VALUES (?, ?, ?)",
+                           (key, expires, json.dumps(value, ensure_ascii=False)))
+                self._sets += 1
+                if self._sets % 200 == 0:  # 偶尔清理过期行
+                    db.execute("DELETE FROM serp_cache WHERE expires < ?", (time.time(),))
+                db.commit()
+            except Exception as e:
+                print(f"[SERP-CACHE] disk write error: {e}")
+
+    # ---------- 内存层 ----------
+    def _mem_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            ent = self._mem.get(key)
+            if ent is None:
+                return None
+            if ent[0] < now:
+                del self._mem[key]
+                return None
+            self._mem.move_to_end(key)
+            self.counters["hit_mem"] += 1
+        request_stats.incr("serp_cache.hit_mem")
+        return ent[1]
+
+    def _after_disk(self, key: str, ent: Optional[Tuple[float, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if ent is not None:
+                self._mem_put(key, ent)
+                self.counters["hit_disk"] += 1
+            else:
+                self.counters["miss"] += 1
+        request_stats.incr("serp_cache.hit_disk" if ent is not None else "serp_cache.miss")
+        return ent[1] if ent is not None else None
+
+    # ---------- 对外接口 ----------
+    # 同步版（get/set）供线程内调用方使用；事件循环上用 aget/aset：
+    # 内存层同步完成，磁盘读放到线程池，磁盘写为 write-behind（不等待）。
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        hit = self._mem_get(key, now)
+        if hit is not None:
+            return hit
+        return self._after_disk(key, self._disk_get(key, now) if self.path else None)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        hit = self._mem_get(key, now)
+        if hit is not None:
+            return hit
+        ent = await asyncio.to_thread(self._disk_get, key, now) if self.path else None
+        return self._after_disk(key, ent)
+
+    def set(self, key: str, value: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        expires = self._set_mem(key, value, ttl_s)
+        if self.path:
+            self._disk_set(key, expires, value)
+
+    def aset(self, key: str, value: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        """内存层立即可见；磁盘写交给线程池异步完成（write-behind），不阻塞事件循环"""
+        if not self.enabled:
+            return
+        expires = self._set_mem(key, value, ttl_s)
+        if self.path:
+            asyncio.get_running_loop().run_in_executor(None, self._disk_set, key, expires, value)
+
+    def _set_mem(self, key: str, value: Dict[str, Any], ttl_s: Optional[float]) -> float:
+        expires = time.time() + (self.ttl_s if ttl_s is None else float(ttl_s))
+        with self._lock:
+            self._mem_put(key, (expires, value))
+            self.counters["set"] += 1
+        return expires
+
+    def _mem_put(self, key: str, ent: Tuple[float, Dict[str, Any]]) -> None:
+        self._mem[key] = ent
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "entries": len(self._mem)}
+
+
+serp_cache = SerpCache.from_env()
@@ -0,0 +1,158 @@
+# providers/serpapi.py
+import os
+import httpx
+import requests
+from contextlib import aclosing
+from typing import Any, Callable, Dict, List, Optional
+
+from providers.http_pool import get_client
+from providers.serp_cache import serp_cache, make_key
+from providers.singleflight import SingleFlight
+from providers.hedging import hedge_policy
+from providers.rate_limit import serpapi_bucket
+from providers.json_stream import iter_json_array
+from runtime import request_stats
+from replay.cassette import recorder
+
+# 所有 SerpAPI 调用（provider / 推荐富化 / domain search）统一经过这里，
+# 以便共享缓存等横切逻辑。
+SERPAPI_URL = os.getenv("AGENT_SERPAPI_URL", "https://serpapi.com/search.json")
+
+# 并发相同查询合并为一次上游请求（缓存未命中时）
+_flight = SingleFlight()
+
+# AGENT_RECORD_DIR 设置时录制真实响应（供 replay.server 离线回放）
+_recorder = recorder()
+
+
+def _limit_wait_s() -> float:
+    try:
+        return float(os.getenv("AGENT_SERPAPI_MAX_WAIT_S", "5"))
+    except Exception:
+        return 5.0
+
+
+def _account(endpoint: str, waited_s: float, status: int) -> None:
+    """每次真实上游调用的记账：请求级（trace.metrics）+ 跨 worker 的按天配额"""
+    request_stats.incr(f"serpapi.calls.{endpoint}")
+    if waited_s > 0:
+        request_stats.incr("serpapi.throttle_wait_ms", int(waited_s * 1000))
+    if status == 429:
+        request_stats.incr("serpapi.http_429")
+    serpapi_bucket.record_call_nowait(endpoint)
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    extra = {k: v for k, v in params.items() if k not in ("engine", "q", "location", "gl", "hl", "api_key")}
+    return make_key(params.get("engine", ""), params.get("q", ""), params.get("location"),
+                    params.get("gl"), params.get("hl"), **extra)
+
+
+def _cacheable(data: Dict[str, Any]) -> bool:
+    return isinstance(data, dict) and not data.get("error")
+
+
+async def search_json(params: Dict[str, Any], *, endpoint: str = "serpapi",
+                      client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
+    """
+    异步查询 SerpAPI（先查缓存）。返回解析后的 JSON dict（只读）。
+    endpoint: 调用方标识（如 provider 名），用于按来源统计延迟/对冲。
+    """
+    key = cache_key(params)
+    hit = await serp_cache.aget(key)
+    if hit is not None:
+        return hit
+
+    async def fetch() -> Dict[str, Any]:
+        data = await hedge_policy.run(endpoint, lambda: _http_get_json(params, client, endpoint))
+        if _cacheable(data):
+            serp_cache.aset(key, data)
+        return data
+
+    return await _flight.do(key, fetch)
+
+
+async def _http_get_json(params: Dict[str, Any], client: Optional[httpx.AsyncClient], endpoint: str) -> Dict[str, Any]:
+    waited = await serpapi_bucket.acquire(_limit_wait_s())
+    client = client or get_client()
+    if client is not None:
+        r = await client.get(SERPAPI_URL, params=params)
+    else:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=6.0)) as c:
+            r = await c.get(SERPAPI_URL, params=params)
+    _account(endpoint, waited, r.status_code)
+    r.raise_for_status()
+    data = r.json()
+    if _recorder is not None:
+        _recorder.record_nowait(SERPAPI_URL, params, r.status_code, data, endpoint=endpoint)
+    return data
+
+
+async def search_stream(params: Dict[str, Any], *, endpoint: str, limit: int,
+                        accept: Callable[[Dict[str, Any]], bool],
+                        client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+    """
+    流式查询：增量解析 shopping_results，收集到 limit 条 accept(it) 为真的条目后立即停止读取。
+    结果（只含已收集的条目）按 limit 单独缓存，与整包缓存互不干扰。
+    """
+    key = cache_key({**params, "_stream_limit": limit})
+    hit = await serp_cache.aget(key)
+    if hit is not None:
+        return hit.get("shopping_results") or []
+
+    async def fetch() -> List[Dict[str, Any]]:
+        items = await hedge_policy.run(
+            endpoint, lambda: _http_stream_items(params, client, endpoint, limit, accept))
+        if items:
+            serp_cache.aset(key, {"shopping_results": items})
+        return items
+
+    return await _flight.do(key, fetch)
+
+
+async def _http_stream_items(params: Dict[str, Any], client: Optional[httpx.AsyncClient], endpoint: str,
+                             limit: int, accept: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
+    waited = await serpapi_bucket.acquire(_limit_wait_s())
+    own = None
+    client = client or get_client()
+    if client is None:
+        client = own = httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=6.0))
+    try:
+        async with client.stream("GET", SERPAPI_URL, params=params) as r:
+            _account(endpoint, waited, r.status_code)
+            r.raise_for_status()
+            out: List[Dict[str, Any]] = []
+            async with aclosing(iter_json_array(r.aiter_bytes(), "shopping_results")) as items:
+                async for it in items:
+                    if accept(it):
+                        out.append(it)
+                        if len(out) >= limit:
+                            request_stats.incr("serpapi.stream_early_stop")
+                            break
+            if _recorder is not None:
+                _recorder.record_nowait(SERPAPI_URL, params, r.status_code, {"shopping_results": out},
+                                        endpoint=endpoint, partial=True)
+            return out
+    finally:
+        if own is not None:
+            await own.aclose()
+
+
+def search_json_sync(params: Dict[str, Any], *, endpoint: str = "serpapi", timeout: float = 25.0) -> Dict[str, Any]:
+    """同步版本（requests），供尚未异步化的调用方使用。"""
+    key = cache_key(params)
+    hit = serp_cache.get(key)
+    if hit is not None:
+        return hit
+
+    waited = serpapi_bucket.acquire_sync(_limit_wait_s())
+    r = requests.get(SERPAPI_URL, params=params, timeout=timeout)
+    _account(endpoint, waited, r.status_code)
+    r.raise_for_status()
+    data = r.json()
+    if _recorder is not None:
+        _recorder.record(SERPAPI_URL, params, r.status_code, data, endpoint=endpoint)
+
+    if _cacheable(data):
+        serp_cache.set(key, data)
+    return data
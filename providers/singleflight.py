@@ -0,0 +1,53 @@
+# providers/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from runtime import request_stats
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    并发相同 key 的请求合并为一次上游调用（N → 1）。
+    - 所有 waiter 共享同一个 in-flight future：结果/异常对每个 waiter 原样传播
+    - 某个 waiter 被取消只影响它自己；最后一个 waiter 离开时才取消上游调用
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+            request_stats.incr("singleflight.leader")
+        else:
+            request_stats.incr("singleflight.shared")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # 没有其他人在等了：取消上游，并立即摘除，避免新来的请求拿到正在取消的 future
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,101 @@
+# providers/synthetic.py
+import os, time, asyncio, random
+from typing import Any, Dict, List, Optional
+from models import CompareQuery, PriceItem, trusted_item
+from replay.latency import LatencyModel
+from runtime import request_stats
+
+# 少量规格变体，保证跨 provider 出现可去重的同款
+_VARIANTS = ["128GB Black", "256GB Blue", "256GB Black", "512GB Silver"]
+_CONDITIONS = ["new", "new", "new", "refurbished"]
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def sanitize_config(cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    客户端传入的合成参数（prefs.synthetic）只保留已知键并限幅：
+    items ≤ AGENT_SYNTHETIC_MAX_ITEMS（默认 100），延迟 ≤ AGENT_SYNTHETIC_MAX_MS（默认 5000ms），概率在 [0, 1]。
+    """
+    cfg = cfg or {}
+    max_items = int(_env_num("AGENT_SYNTHETIC_MAX_ITEMS", 100))
+    max_ms = _env_num("AGENT_SYNTHETIC_MAX_MS", 5000.0)
+    out: Dict[str, Any] = {}
+    try:
+        if cfg.get("items") is not None:
+            out["items"] = min(max_items, max(0, int(cfg["items"])))
+        for k in ("median_ms", "spike_ms"):
+            if cfg.get(k) is not None:
+                out[k] = min(max_ms, max(0.0, float(cfg[k])))
+        if cfg.get("sigma") is not None:
+            out["sigma"] = min(3.0, max(0.0, float(cfg["sigma"])))
+        for k in ("spike_p", "error_rate"):
+            if cfg.get(k) is not None:
+                out[k] = min(1.0, max(0.0, float(cfg[k])))
+        if cfg.get("base_price") is not None:
+            out["base_price"] = max(0.0, float(cfg["base_price"]))
+        if cfg.get("seed") is not None:
+            out["seed"] = int(cfg["seed"])
+    except (TypeError, ValueError):
+        pass
+    return out
+
+class SyntheticProvider:
+    """
+    压测用合成 provider：条目数、延迟分布（对数正态 + 长尾尖刺）、错误率均可配置。
+    seed 固定时同一查询的结果可复现（延迟/报错仍按各自 rng 抽样）。
+    """
+
+    def __init__(self, name: str = "synthetic", items: int = 10, median_ms: float = 80.0, sigma: float = 0.5,
+                 spike_p: float = 0.0, spike_ms: float = 0.0, error_rate: float = 0.0,
+                 base_price: Optional[float] = None, seed: Optional[int] = None):
+        self.name = name
+        self.items = max(0, int(items))
+        self.latency = LatencyModel(median_ms, sigma, spike_p, spike_ms)
+        self.error_rate = float(error_rate)
+        self.base_price = base_price
+        self.seed = seed
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_config(cls, name: str, cfg: Dict[str, Any]) -> "SyntheticProvider":
+        kw = sanitize_config(cfg)
+        if "seed" in kw:
+            kw["seed"] = int(kw["seed"]) + sum(map(ord, name))  # 每个实例不同但可复现
+        return cls(name=name, **kw)
+
+    async def search(self, q: CompareQuery, limit: int = 10) -> List[PriceItem]:
+        await asyncio.sleep(self.latency.sample_s(self._rng))
+        if self.error_rate > 0 and self._rng.random() < self.error_rate:
+            raise RuntimeError(f"{self.name}: synthetic upstream error")
+
+        text = q.text.lower()
+        base = self.base_price or (1880.0 if "iphone" in text else 120.0)
+        rng = random.Random(f"{self.seed}|{self.name}|{text}") if self.seed is not None else self._rng
+        items: List[PriceItem] = []
+        t0 = time.perf_counter()
+        for i in range(min(self.items, limit)):
+            variant = _VARIANTS[rng.randrange(len(_VARIANTS))]
+            items.append(trusted_item(
+                title=f"{q.text} {variant} - {self.name} #{i}",
+                brand="Apple" if "iphone" in text else None,
+                model="MTPV3" if "iphone" in text else None,
+                variant=variant,
+                price=round(base * rng.uniform(0.9, 1.1), 2),
+                currency=q.currency,
+                shipping_cost=rng.choice([0.0, 0.0, 9.95, 14.0]),
+                tax_cost=0.0,
+                seller=self.name,
+                seller_rating=round(rng.uniform(2.5, 5.0), 1),
+                condition=_CONDITIONS[rng.randrange(len(_CONDITIONS))],
+                url=f"https://{self.name.replace('_', '-')}.example/item/{i}",
+                source=self.name,
+            ))
+        request_stats.incr("items.built", len(items))
+        request_stats.incr("items.build_us", int((time.perf_counter() - t0) * 1e6))
+        return items
@@ -0,0 +1,83 @@
+# ranking.py
+import heapq
+from itertools import count
+from typing import Any, Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+RankKey = Tuple[float, ...]
+
+def _rating(x: Any) -> float:
+    if isinstance(x, dict):
+        r = x.get("seller_rating", x.get("rating"))
+    else:
+        r = getattr(x, "seller_rating", None)
+    try:
+        return float(r or 0.0)
+    except Exception:
+        return 0.0
+
+
+def _num(x: Any, *names: str) -> float:
+    for n in names:
+        v = x.get(n) if isinstance(x, dict) else getattr(x, n, None)
+        if v is not None:
+            try:
+                return float(v)
+            except Exception:
+                return 0.0
+    return 0.0
+
+
+def rank_key(strategy: str = "best_total_cost") -> Callable[[Any], RankKey]:
+    """
+    返回排序键函数（数值元组，越小越靠前）：主键 + 评分高优先（评分缺失按 0）。同时支持 models.PriceItem
+    （shipping_cost/tax_cost/seller_rating）、tool_schemas.PriceItem（shipping/tax）和 dict。
+    """
+    if strategy == "best_price":
+        return lambda x: (_num(x, "price"), -_rating(x))
+    return lambda x: (_num(x, "price") + _num(x, "shipping_cost", "shipping") + _num(x, "tax_cost", "tax"),
+                      -_rating(x))
+
+
+class TopKRanker(Generic[T]):
+    """
+    增量 Top-K：条目随到随 push，内部只保留当前最好的 k 个（大小为 k 的最大堆），
+    push 为 O(log k)，topk() 只排序这 k 个。平局保持到达顺序（与 sorted 的稳定性一致）。
+    k 为 None 时不截断（退化为收集后一次排序）。
+    key 必须返回数值元组。
+    """
+
+    def __init__(self, k: Optional[int], key: Callable[[T], RankKey]):
+        self.k = None if k is None else max(0, int(k))
+        self.key = key
+        self._heap: List[Tuple[Tuple[float, ...], int, T]] = []   # (取反的键, -序号, item)
+        self._seq = count()
+        self.seen = 0
+
+    def push(self, item: T) -> None:
+        self.seen += 1
+        seq = next(self._seq)
+        if self.k == 0:
+            return
+        entry = (tuple(-v for v in self.key(item)), -seq, item)
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            # 比当前第 k 名更好（键更小，或同键但更早到达）
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items: Iterable[T]) -> "TopKRanker[T]":
+        for it in items:
+            self.push(it)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def topk(self) -> List[T]:
+        return [e[2] for e in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+def top_k(items: Iterable[T], k: Optional[int], strategy: str = "best_total_cost") -> List[T]:
+    return TopKRanker(k, rank_key(strategy)).extend(items).topk()
+
@@ -1,9 +1,10 @@
-import os, time, requests
+import os, time, asyncio
 from typing import List, Optional
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from providers.serpapi import search_json
 
 # ==============================================================
 # 🔹 一、数据结构
@@ -75,14 +76,8 @@ Return ONLY valid JSON:
 
 SERP_API_KEY = os.getenv("SERPAPI_KEY")
 
-def find_product_link(query: str, gl: str = "us", hl: str = "en") -> Optional[dict]:
-    """
-    调用 SerpAPI (Google Shopping) 获取首条结果信息。
-    返回 {"title","price","url","source"} 或 None。
-    """
-    if not SERP_API_KEY:
-        return None
-    params = {
+def _enrich_params(query: str, gl: str, hl: str) -> dict:
+    return {
         "engine": "google_shopping",
         "q": query,
         "gl": gl,
@@ -90,92 +85,124 @@ def find_product_link(query: str, gl: str = "us", hl: str = "en") -> Optional[di
         "num": 3,
         "api_key": SERP_API_KEY,
     }
+
+def _first_hit(j: dict) -> Optional[dict]:
+    for s in j.get("shopping_results", []):
+        return {
+            "title": s.get("title"),
+            "price": s.get("price") or s.get("extracted_price"),
+            "url": s.get("link") or s.get("product_link"),
+            "source": s.get("source"),
+        }
+    return None
+
+async def find_product_link_async(query: str, gl: str = "us", hl: str = "en",
+                                  timeout_s: float = 8.0) -> Optional[dict]:
+    """
+    调用 SerpAPI (Google Shopping) 获取首条结果信息（走共享连接池）。
+    返回 {"title","price","url","source"}；超时/异常返回 None。
+    """
+    if not SERP_API_KEY:
+        return None
     try:
-        r = requests.get("https://serpapi.com/search.json", params=params, timeout=8)
-        j = r.json()
-        for s in j.get("shopping_results", []):
-            return {
-                "title": s.get("title"),
-                "price": s.get("price") or s.get("extracted_price"),
-                "url": s.get("link") or s.get("product_link"),
-                "source": s.get("source"),
-            }
+        j = await asyncio.wait_for(
+            search_json(_enrich_params(query, gl, hl), endpoint="recommend_enrich"), timeout_s)
+        return _first_hit(j)
     except Exception:
         return None
-    return None
+
+
+def _enrich_query(it: dict, data: dict) -> str:
+    return f"{it['name']} {data.get('category','')} buy"
+
+def _apply_hit(it: dict, hit: Optional[dict]) -> bool:
+    if not hit:
+        return False
+    it["link"] = hit.get("url")
+    it["price"] = hit.get("price")
+    it["source"] = hit.get("source")
+    return True
+
+async def enrich_items_async(data: dict, max_items: int = 5) -> int:
+    """并发富化前 max_items 条推荐（每条独立超时），返回成功条数。"""
+    try:
+        timeout_s = float(os.getenv("AGENT_ENRICH_TIMEOUT_S", "8"))
+    except Exception:
+        timeout_s = 8.0
+    items = data.get("items", [])[:max_items]
+    hits = await asyncio.gather(*[
+        find_product_link_async(_enrich_query(it, data), timeout_s=timeout_s) for it in items
+    ])
+    return sum(1 for it, hit in zip(items, hits) if _apply_hit(it, hit))
 
 
 # ==============================================================
 # 🔹 五、主函数：生成推荐 + 类型识别 + 链接富化
 # ==============================================================
 
-def generate_recommendations(query: str) -> Recommendation:
-    # 初始化 LLM
-    llm = ChatOpenAI(
+def _build_llm() -> ChatOpenAI:
+    return ChatOpenAI(
         model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
         temperature=0.7,
         timeout=int(os.getenv("LLM_TIMEOUT_S", "25")),
         max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")),
     )
 
+def _raw_to_data(raw) -> dict:
+    if isinstance(raw, Recommendation):
+        return raw.model_dump()
+    if hasattr(raw, "model_dump"):
+        return raw.model_dump()
+    if hasattr(raw, "dict"):
+        return raw.dict()
+    return dict(raw) if isinstance(raw, dict) else {}
+
+def _recommend_type_of(type_result) -> str:
+    if isinstance(type_result, dict):
+        return type_result.get("recommend_type", "other")
+    return getattr(type_result, "recommend_type", "other")
+
+def _fallback(e: Exception, t0: float) -> Recommendation:
+    return Recommendation(
+        category="unknown",
+        items=[],
+        reasoning=f"Fallback: unable to generate ({str(e)})",
+        latency_ms=int((time.time() - t0) * 1000),
+    )
+
+
+def generate_recommendations(query: str) -> Recommendation:
+    """同步入口（脚本/非事件循环环境）：委托给 generate_recommendations_async，只保留一套富化实现。"""
+    return asyncio.run(generate_recommendations_async(query))
+
+
+async def generate_recommendations_async(query: str) -> Recommendation:
+    """异步版本：LLM 用 ainvoke，富化阶段所有条目并发查询（不阻塞事件循环）。"""
+    llm = _build_llm()
+
     parser = JsonOutputParser(pydantic_object=Recommendation)
     chain = prompt | llm | parser
 
-    # Step 1️⃣: 生成推荐
     t0 = time.time()
     try:
-        raw = chain.invoke({"query": query})
-        if isinstance(raw, Recommendation):
-            data = raw.model_dump()
-        elif hasattr(raw, "model_dump"):
-            data = raw.model_dump()
-        elif hasattr(raw, "dict"):
-            data = raw.dict()
-        else:
-            data = dict(raw) if isinstance(raw, dict) else {}
-
+        data = _raw_to_data(await chain.ainvoke({"query": query}))
         data["latency_ms"] = int((time.time() - t0) * 1000)
     except Exception as e:
-        return Recommendation(
-            category="unknown",
-            items=[],
-            reasoning=f"Fallback: unable to generate ({str(e)})",
-            latency_ms=int((time.time() - t0) * 1000),
-        )
+        return _fallback(e, t0)
 
-    # Step 2️⃣: 识别推荐类型
-    type_parser = JsonOutputParser()
-    type_chain = type_prompt | llm | type_parser
+    type_chain = type_prompt | llm | JsonOutputParser()
 
     t1 = time.time()
     try:
-        type_result = type_chain.invoke({"query": query})
-        if isinstance(type_result, dict):
-            recommend_type = type_result.get("recommend_type", "other")
-        else:
-            recommend_type = getattr(type_result, "recommend_type", "other")
-        data["recommend_type"] = recommend_type
+        data["recommend_type"] = _recommend_type_of(await type_chain.ainvoke({"query": query}))
         data["extract_latency_ms"] = int((time.time() - t1) * 1000)
     except Exception as e:
         data["recommend_type"] = f"extract_error({str(e)})"
         data["extract_latency_ms"] = int((time.time() - t1) * 1000)
 
-    # Step 3️⃣: 富化推荐结果（SerpAPI 链接/价格/来源）
     enrich_start = time.time()
-    items = data.get("items", [])
-    success_count = 0
-    for it in items[:5]:  # 仅前5条
-        q = f"{it['name']} {data.get('category','')} buy"
-        hit = find_product_link(q)
-        if hit:
-            it["link"] = hit.get("url")
-            it["price"] = hit.get("price")
-            it["source"] = hit.get("source")
-            success_count += 1
+    success_count = await enrich_items_async(data, max_items=5)
     data["extract_latency_ms"] = (data.get("extract_latency_ms") or 0) + int((time.time() - enrich_start) * 1000)
 
-    # Step 4️⃣: 记录富化情况
     data["reasoning"] += f"\n\n(Enriched with {success_count} product links via SerpAPI.)"
-
-    # Step 5️⃣: 返回结果
     return Recommendation(**data)
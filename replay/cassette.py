@@ -0,0 +1,83 @@
+# replay/cassette.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+# 不参与匹配的参数（密钥等）
+IGNORED_PARAMS = ("api_key",)
+
+
+def request_key(path: str, params: Dict[str, Any]) -> str:
+    """(path, 排序后的参数) → 稳定 key；与主机无关，便于一个 stand-in 同时替身多个上游"""
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    raw = json.dumps([path.rstrip("/") or "/", items], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """一目录一盘磁带：每个请求一个 JSON 文件 {request, status, body, recorded_at}"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def record(self, url: str, params: Dict[str, Any], status: int, body: Any, **meta: Any) -> None:
+        path = urlsplit(url).path
+        key = request_key(path, params)
+        entry = {
+            "request": {
+                "url": url,
+                "path": path,
+                "params": {k: str(v) for k, v in (params or {}).items() if k not in IGNORED_PARAMS},
+            },
+            "status": int(status),
+            "body": body,
+            "recorded_at": time.time(),
+            **meta,
+        }
+        try:
+            with self._lock:
+                os.makedirs(self.root, exist_ok=True)
+                tmp = self._file(key) + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp, self._file(key))
+        except Exception as e:
+            print(f"[REPLAY] record error: {e}")
+
+    def record_nowait(self, url: str, params: Dict[str, Any], status: int, body: Any, **meta: Any) -> None:
+        """事件循环内调用：落盘交给线程池（write-behind），不阻塞请求路径；没有运行中的 loop 时同步写"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.record(url, params, status, body, **meta)
+            return
+        params = dict(params or {})   # 调用方之后可能复用/修改 params
+        loop.run_in_executor(None, lambda: self.record(url, params, status, body, **meta))
+
+    def lookup(self, path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file(request_key(path, params)), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for n in os.listdir(self.root) if n.endswith(".json"))
+        except FileNotFoundError:
+            return 0
+
+
+def recorder() -> Optional[CassetteStore]:
+    """AGENT_RECORD_DIR 设置时返回录制用的 store，否则 None（不录制）"""
+    root = os.getenv("AGENT_RECORD_DIR", "")
+    return CassetteStore(root) if root else None
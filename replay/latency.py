@@ -0,0 +1,27 @@
+# replay/latency.py
+import math
+import random
+
+# 回放 stand-in 与合成 provider 共用的延迟分布（provider 不应依赖 replay.server）
+
+
+class LatencyModel:
+    """对数正态延迟（中位数 median_ms，形状 sigma），可叠加概率为 spike_p 的长尾 spike_ms"""
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.0, spike_p: float = 0.0, spike_ms: float = 0.0):
+        self.median_ms = max(0.0, median_ms)
+        self.sigma = max(0.0, sigma)
+        self.spike_p = spike_p
+        self.spike_ms = spike_ms
+
+    def sample_s(self, rng: random.Random = None) -> float:
+        rng = rng or random
+        if self.median_ms <= 0:
+            ms = 0.0
+        elif self.sigma > 0:
+            ms = rng.lognormvariate(math.log(self.median_ms), self.sigma)
+        else:
+            ms = self.median_ms
+        if self.spike_p > 0 and rng.random() < self.spike_p:
+            ms += self.spike_ms
+        return ms / 1000.0
@@ -0,0 +1,77 @@
+# replay/server.py
+"""
+本地 stand-in：按录制的磁带回放 SerpAPI / FakeStore 响应，可配置延迟分布。
+
+  录制：AGENT_RECORD_DIR=cassettes uvicorn app:app ...
+  回放：python -m replay.server --dir cassettes --port 8787 --latency-ms 800 --sigma 0.5
+        AGENT_SERPAPI_URL=http://127.0.0.1:8787/search.json \
+        AGENT_FAKESTORE_URL=http://127.0.0.1:8787 uvicorn app:app ...
+"""
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from replay.cassette import CassetteStore
+from replay.latency import LatencyModel
+
+
+def make_handler(store: CassetteStore, latency: LatencyModel, miss_status: int = 404):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = dict(parse_qsl(parts.query, keep_blank_values=True))
+            entry = store.lookup(parts.path, params)
+            time.sleep(latency.sample_s())
+            if entry is None:
+                status, body = miss_status, {"error": f"no cassette for {parts.path}"}
+            else:
+                status, body = entry.get("status", 200), entry.get("body")
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(store: CassetteStore, host: str = "127.0.0.1", port: int = 8787,
+          latency: LatencyModel = None, miss_status: int = 404) -> ThreadingHTTPServer:
+    """创建（未启动）的 stand-in 服务器；调用方 serve_forever() 或放到线程里跑"""
+    return ThreadingHTTPServer((host, port), make_handler(store, latency or LatencyModel(), miss_status))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded SerpAPI/FakeStore traffic")
+    ap.add_argument("--dir", default="cassettes")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="median latency")
+    ap.add_argument("--sigma", type=float, default=0.0, help="lognormal shape (0 = fixed latency)")
+    ap.add_argument("--spike-p", type=float, default=0.0, help="probability of a tail spike")
+    ap.add_argument("--spike-ms", type=float, default=0.0)
+    ap.add_argument("--miss-status", type=int, default=404)
+    args = ap.parse_args()
+
+    store = CassetteStore(args.dir)
+    srv = serve(store, args.host, args.port,
+                LatencyModel(args.latency_ms, args.sigma, args.spike_p, args.spike_ms), args.miss_status)
+    print(f"[REPLAY] serving {len(store)} cassettes from {args.dir} on http://{args.host}:{args.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+
+if __name__ == "__main__":
+    main()
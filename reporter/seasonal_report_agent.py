@@ -4,6 +4,11 @@ from typing import List
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel
+from replay.cassette import recorder
+
+# 可指向 replay.server 等本地 stand-in
+FAKESTORE_URL = os.getenv("AGENT_FAKESTORE_URL", "https://fakestoreapi.com").rstrip("/")
+_recorder = recorder()
 
 class Product(BaseModel):
     rank: int
@@ -37,9 +42,11 @@ def generate_seasonal_report(quarter: str = "2025-Q4", limit: int = 50) -> Seaso
         trace_steps.append({"name": "parse_quarter", "note": f"Year={year}, Quarter={q}"})
 
         # Step 2️⃣: 调用 FakeStore API
-        response = requests.get("https://fakestoreapi.com/products", timeout=10)
+        response = requests.get(f"{FAKESTORE_URL}/products", timeout=10)
         response.raise_for_status()
         data = response.json()
+        if _recorder is not None:
+            _recorder.record(f"{FAKESTORE_URL}/products", {}, response.status_code, data)
         trace_steps.append({"name": "data_fetch", "note": f"Fetched {len(data)} products"})
 
         # Step 3️⃣: 生成季度销量
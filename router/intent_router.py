@@ -6,6 +6,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_openai import ChatOpenAI
 
+from runtime.keywords import KeywordMatcher
+
 
 # ==============================================================
 # 🔹 一、关键词规则表（仅作为 LLM 提示，不再强制分类）
@@ -35,14 +37,18 @@ KEYS = {
 }
 
 
+# 各 intent 的关键词集合（共享匹配器）
+_KW = KeywordMatcher(KEYS)
+
+
 def rule_based(text: str) -> Optional[str]:
     """
     简单规则匹配：若命中关键词，则作为 hint 提示给 LLM。
     不再直接决定 intent。
     """
-    t = text.lower()
-    for intent, words in KEYS.items():
-        if any(w in t for w in words):
+    hits = _KW.scan(text.lower())
+    for intent in KEYS:
+        if intent in hits:
             return intent
     return None
 
@@ -0,0 +1,72 @@
+# runtime/diagnostics.py
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class DiagnosticsRing:
+    """
+    采样诊断环形缓冲：按 sample_rate 抽样请求，保存 price_compare_full 的完整阶段记录（最近 size 条）。
+    - 未被抽中的请求只付出一次 sample() 判断（rate=0 时连随机数都不取）
+    - 被抽中的请求照常收集 diag["debug"]，但只有 prefs.debug 时才随响应内联返回
+    """
+
+    def __init__(self, sample_rate: float = 0.0, size: int = 200):
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        self.size = max(1, int(size))
+        self._buf: Deque[Dict[str, Any]] = deque(maxlen=self.size)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.counters = {"sampled": 0, "recorded": 0}
+
+    @classmethod
+    def from_env(cls) -> "DiagnosticsRing":
+        try:
+            return cls(
+                sample_rate=float(os.getenv("AGENT_DIAG_SAMPLE_RATE", "0")),
+                size=int(os.getenv("AGENT_DIAG_RING_SIZE", "200")),
+            )
+        except Exception:
+            return cls()
+
+    def sample(self) -> bool:
+        rate = self.sample_rate
+        if rate <= 0.0:
+            return False
+        hit = rate >= 1.0 or random.random() < rate
+        if hit:
+            self.counters["sampled"] += 1
+        return hit
+
+    def record(self, text: str, diagnostics: Dict[str, Any], **extra: Any) -> None:
+        with self._lock:
+            self._seq += 1
+            self._buf.append({
+                "seq": self._seq,
+                "ts": time.time(),
+                "text": (text or "")[:200],
+                "domain": diagnostics.get("domain"),
+                **extra,
+                "diagnostics": diagnostics,
+            })
+            self.counters["recorded"] += 1
+
+    def entries(self, limit: Optional[int] = None, domain: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最新的在前；domain 非空时只取该域"""
+        with self._lock:
+            out = list(self._buf)
+        out.reverse()
+        if domain:
+            out = [e for e in out if e.get("domain") == domain]
+        if limit is not None:
+            out = out[:max(0, int(limit))]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sample_rate": self.sample_rate, "size": self.size, "buffered": len(self._buf), **self.counters}
+
+
+diag_ring = DiagnosticsRing.from_env()
@@ -3,6 +3,16 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List, Tuple, Optional
 from .profiles import DomainProfile, register_profile
+from .features import lower_blob
+from runtime.keywords import KeywordMatcher
+
+_RX_ISBN = re.compile(r"\b97[89][- ]?\d{1,5}[- ]?\d{1,7}[- ]?\d{1,7}[- ]?[\dxX]\b")
+_RX_WS = re.compile(r"\s+")
+
+_KW = KeywordMatcher({
+    "bookish": ["book","novel","paperback","hardcover","ebook","isbn","author"],
+    "merch": ["poster","sticker","bookmark","book light","cover"],
+})
 
 class BooksProfile:
     name = "books"
@@ -11,7 +21,7 @@ class BooksProfile:
     def auto_score(text: str) -> Tuple[float, Dict[str, Any]]:
         t = (text or "").lower()
         score, ev = 0.0, {"hits": []}
-        if any(k in t for k in ["book","novel","paperback","hardcover","ebook","isbn","author"]):
+        if _KW.has(t, "bookish"):
             score += 0.8; ev["hits"].append("bookish")
         return (score if score >= 0.8 else 0.0), ev
 
@@ -23,7 +33,7 @@ class BooksProfile:
     def entity_extract(text: str) -> Dict[str, Any]:
         t = (text or "").lower()
         isbn = None
-        m = re.search(r"\b97[89][- ]?\d{1,5}[- ]?\d{1,7}[- ]?\d{1,7}[- ]?[\dxX]\b", t)
+        m = _RX_ISBN.search(t)
         if m: isbn = m.group(0)
         fmt = None
         for f in ["paperback","hardcover","ebook","audiobook"]:
@@ -33,7 +43,7 @@ class BooksProfile:
     @staticmethod
     def filter_model(item: Dict[str, Any], entities: Dict[str, Any], *, strict: bool) -> bool:
         # 若有 ISBN，要求命中；否则放行
-        title = (str(item.get("title") or "") + " " + str(item.get("subtitle") or "") + " " + str(item.get("description") or "")).lower()
+        title = lower_blob(item, "title", "subtitle", "description")
         isbn = entities.get("isbn")
         if isbn:
             return isbn.replace("-", "").replace(" ", "") in title.replace("-", "").replace(" ", "")
@@ -51,12 +61,12 @@ class BooksProfile:
         # 过滤周边（海报/贴纸），除非是配件意图
         if is_accessory_intent:
             return True
-        t = " ".join([str(item.get("title") or ""), str(item.get("category") or "")]).lower()
-        return not any(k in t for k in ["poster","sticker","bookmark","book light","cover"])
+        t = lower_blob(item, "title", "category")
+        return not _KW.has(t, "merch")
 
     @staticmethod
     def dedup_key(title: str, item: Dict[str, Any]) -> str:
-        return re.sub(r"\s+", " ", (title or "").lower()).strip()
+        return _RX_WS.sub(" ", (title or "").lower()).strip()
 
     @staticmethod
     def fallback_plan() -> List[str]:
@@ -3,6 +3,20 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List, Tuple, Optional
 from .profiles import DomainProfile, register_profile
+from .features import memo, lower_blob
+from .matchers import compiled
+from runtime.keywords import KeywordMatcher
+
+# 热路径正则：模块加载时编译一次
+_RX_NUMBER = re.compile(r"[-+]?\d*\.?\d+")
+_RX_SIZE_CUE = re.compile(r"\b(\d+)\s*(ml|mL|fl\s*oz|fluid\s*ounce)\b")
+_RX_ML = re.compile(r"(\d+(?:\.\d+)?)\s*mL\b", re.IGNORECASE)
+_RX_OZ = re.compile(r"(\d+(?:\.\d+)?)\s*(fl\.?\s*oz|fluid\s*ounce|oz)\b", re.IGNORECASE)
+_RX_CAP_WORD = re.compile(r"\b([A-Z][a-zA-Z]+)\b")
+_RX_FILLER = re.compile(r"\b(with|advanced|intense|ultimate|classic|original|new|latest)\b")
+_RX_NON_ALNUM = re.compile(r"[^a-z0-9%.\s]+")
+_RX_WS = re.compile(r"\s+")
+_RX_INSTALLMENT = re.compile(r"(/mo|per\s*month|\b\d+\s*mo(nths)?\b)", re.IGNORECASE)
 
 class CosmeticsProfile:
     """
@@ -46,7 +60,7 @@ class CosmeticsProfile:
         if isinstance(x, (int, float)): return float(x)
         if isinstance(x, str):
             s = x.replace(",", "")
-            m = re.search(r"[-+]?\d*\.?\d+", s)
+            m = _RX_NUMBER.search(s)
             return float(m.group()) if m else None
         return None
 
@@ -55,11 +69,12 @@ class CosmeticsProfile:
     def auto_score(text: str) -> Tuple[float, Dict[str, Any]]:
         t = (text or "").lower()
         score, ev = 0.0, {"hits": []}
-        if any(k in t for k in CosmeticsProfile.CATEGORIES):
+        kw = _KW.scan(t)
+        if "category" in kw:
             score += 0.5; ev["hits"].append("category")
-        if any(k in t for k in CosmeticsProfile.ACTIVES):
+        if "active" in kw:
             score += 0.4; ev["hits"].append("active")
-        if re.search(r"\b(\d+)\s*(ml|mL|fl\s*oz|fluid\s*ounce)\b", t):
+        if _RX_SIZE_CUE.search(t):
             score += 0.2; ev["hits"].append("size")
         return (score if score >= 0.8 else 0.0), ev
 
@@ -112,31 +127,30 @@ class CosmeticsProfile:
         if not s: return None
         s = s.replace("\u2009"," ").replace("\xa0"," ")
         # 30 mL / 30ml
-        m = re.search(r"(\d+(?:\.\d+)?)\s*mL\b", s, flags=re.IGNORECASE)
+        m = _RX_ML.search(s)
         if m: return float(m.group(1))
         # 1 fl oz / 1 oz
-        m = re.search(r"(\d+(?:\.\d+)?)\s*(fl\.?\s*oz|fluid\s*ounce|oz)\b", s, flags=re.IGNORECASE)
+        m = _RX_OZ.search(s)
         if m: return CosmeticsProfile._oz_to_ml(float(m.group(1)))
         return None
 
     @staticmethod
     def _brand_from_text(s: str) -> Optional[str]:
-        t = (s or "").lower()
-        for b in CosmeticsProfile.BRAND_HINTS:
-            if b in t: return b
+        b = _KW.first((s or "").lower(), "brand")
+        if b: return b
         # fallback: first token heuristic (Capitalized word at start)
-        m = re.search(r"\b([A-Z][a-zA-Z]+)\b", s or "")
+        m = _RX_CAP_WORD.search(s or "")
         return m.group(1).lower() if m else None
 
     @staticmethod
     def _canonical_name(title: str, brand: Optional[str]) -> str:
         t = (title or "").lower()
         if brand:
-            t = re.sub(re.escape(brand), " ", t)
+            t = compiled(re.escape(brand)).sub(" ", t)
         # remove filler marketing words but keep active cues & percentages
-        t = re.sub(r"\b(with|advanced|intense|ultimate|classic|original|new|latest)\b", " ", t)
-        t = re.sub(r"[^a-z0-9%.\s]+", " ", t)
-        t = re.sub(r"\s+", " ", t).strip()
+        t = _RX_FILLER.sub(" ", t)
+        t = _RX_NON_ALNUM.sub(" ", t)
+        t = _RX_WS.sub(" ", t).strip()
         return t
 
     @staticmethod
@@ -148,21 +162,22 @@ class CosmeticsProfile:
     # ---------- model filter (category & size window) ----------
     @staticmethod
     def filter_model(item: Dict[str, Any], entities: Dict[str, Any], *, strict: bool) -> bool:
-        title = (str(item.get("title") or "") + " " + str(item.get("subtitle") or "")).lower()
+        title = lower_blob(item, "title", "subtitle")
 
         # category: 如果查询偏向 serum，则优先 serum/essence/ampoule
         if entities.get("want_serum"):
-            if not any(k in title for k in ["serum","essence","ampoule"]):
+            if not _KW.has(title, "serum"):
                 return False
 
         # 套装/小样过滤（查询阶段不加负词，这里过滤）
-        if any(k in title for k in CosmeticsProfile.BUNDLE_NEG):
+        if _KW.has(title, "bundle"):
             return False
 
         # 容量窗口（若目标容量存在）
         tgt = entities.get("target_ml")
         if tgt:
-            size_ml = CosmeticsProfile._parse_size_ml(title) or CosmeticsProfile._parse_size_ml(str(item.get("description") or ""))
+            size_ml = memo(item, "size_ml_blob", lambda: CosmeticsProfile._parse_size_ml(title)
+                           or CosmeticsProfile._parse_size_ml(str(item.get("description") or "")))
             if size_ml is None:
                 # 新逻辑：即使严格模式，容量缺失也不淘汰，交给排序降权
                 return True
@@ -176,8 +191,8 @@ class CosmeticsProfile:
     @staticmethod
     def normalize_price(item: Dict[str, Any]) -> Tuple[bool, Optional[float], Optional[str]]:
         # Cosmetics seldom have installments; treat /mo as noise → missing_price
-        blob = " ".join([str(item.get("price_str") or ""), str(item.get("priceText") or ""), str(item.get("snippet") or "")]).lower()
-        if re.search(r"(/mo|per\s*month|\b\d+\s*mo(nths)?\b)", blob, re.IGNORECASE):
+        blob = lower_blob(item, "price_str", "priceText", "snippet")
+        if _RX_INSTALLMENT.search(blob):
             return False, None, "missing_price"
 
         v = item.get("price")
@@ -199,9 +214,8 @@ class CosmeticsProfile:
         # Cosmetics: drop only tools/organizers unless accessory intent
         if is_accessory_intent:
             return True
-        t = " ".join([str(item.get("title") or ""), str(item.get("category") or "")]).lower()
-        tool_neg = ["brush","applicator","organizer","bag","pouch","spatula","mixing bowl"]
-        return not any(k in t for k in tool_neg)
+        t = lower_blob(item, "title", "category")
+        return not _KW.has(t, "tool")
 
     # ---------- dedup key ----------
     @staticmethod
@@ -210,7 +224,8 @@ class CosmeticsProfile:
         brand = CosmeticsProfile._brand_from_text(title) or CosmeticsProfile._brand_from_text(str(item.get("brand") or ""))
         canon = CosmeticsProfile._canonical_name(title, brand)
         # size bucket (round to nearest 5 mL)
-        size_ml = CosmeticsProfile._parse_size_ml(title) or CosmeticsProfile._parse_size_ml(str(item.get("description") or ""))
+        size_ml = memo(item, "size_ml_title", lambda: CosmeticsProfile._parse_size_ml(title)
+                       or CosmeticsProfile._parse_size_ml(str(item.get("description") or "")))
         bucket = None
         if size_ml is not None:
             bucket = int(round(size_ml / 5.0) * 5)
@@ -221,4 +236,14 @@ class CosmeticsProfile:
     def fallback_plan() -> List[str]:
         return ["second_pass_query", "expand_size_window", "allow_missing_price_as_null_price"]
 
+# 关键词表（共享匹配器：小表走 C 层子串查找，品牌表扩到上千条时自动切换到 Aho-Corasick）
+_KW = KeywordMatcher({
+    "category": CosmeticsProfile.CATEGORIES,
+    "active": CosmeticsProfile.ACTIVES,
+    "serum": ["serum","essence","ampoule"],
+    "bundle": CosmeticsProfile.BUNDLE_NEG,
+    "brand": CosmeticsProfile.BRAND_HINTS,
+    "tool": ["brush","applicator","organizer","bag","pouch","spatula","mixing bowl"],
+})
+
 register_profile(CosmeticsProfile())
@@ -3,6 +3,10 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List, Tuple, Optional
 from .profiles import DomainProfile, register_profile
+from .features import lower_blob
+
+_RX_SIZE = re.compile(r"\b(xs|s|m|l|xl|xxl)\b")
+_RX_WS = re.compile(r"\s+")
 
 class FashionProfile:
     name = "fashion"
@@ -45,13 +49,13 @@ class FashionProfile:
             if c in t:
                 category = c; break
         size = None
-        m = re.search(r"\b(xs|s|m|l|xl|xxl)\b", t)
+        m = _RX_SIZE.search(t)
         if m: size = m.group(1)
         return {"brand": brand, "category": category, "size": size}
 
     @staticmethod
     def filter_model(item: Dict[str, Any], entities: Dict[str, Any], *, strict: bool) -> bool:
-        title = (str(item.get("title") or "") + " " + str(item.get("subtitle") or "")).lower()
+        title = lower_blob(item, "title", "subtitle")
         brand = entities.get("brand")
         category = entities.get("category")
         if brand and brand not in title:
@@ -75,7 +79,7 @@ class FashionProfile:
 
     @staticmethod
     def dedup_key(title: str, item: Dict[str, Any]) -> str:
-        return re.sub(r"\s+", " ", (title or "").lower()).strip()
+        return _RX_WS.sub(" ", (title or "").lower()).strip()
 
     @staticmethod
     def fallback_plan() -> List[str]:
@@ -0,0 +1,77 @@
+# runtime/domain/features.py
+from __future__ import annotations
+import inspect
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from models import item_fields
+
+DEFAULT_URL = "https://example.com/unknown"
+
+
+class ItemFeatures(dict):
+    """
+    单条原始结果的特征记录（每个请求每条只算一次）：
+    - 本身就是 dump 出来的字段 dict，profile 接口（d.get(...)）无需改动
+    - title / url 预先取好；小写文本拼接、docids、价格口径、容量解析等按需计算并缓存
+    A 严格 / 宽松回退 / 软评分补位 / B / C / D 各阶段共用同一份记录。
+    """
+    __slots__ = ("title", "url", "_memo")
+
+    def __init__(self, d: Dict[str, Any]):
+        super().__init__(d)
+        title = d.get("title")
+        if title in (None, "", []):
+            title = d.get("name")
+        self.title = str(title if title not in (None, "", []) else "").strip()
+        self.url = str(d.get("url") or DEFAULT_URL)
+        self._memo: Dict[Any, Any] = {}
+
+    @classmethod
+    def of(cls, it: Any) -> "ItemFeatures":
+        return it if isinstance(it, cls) else cls(item_fields(it))
+
+    def memo(self, key: Any, fn: Callable[[], Any]) -> Any:
+        try:
+            return self._memo[key]
+        except KeyError:
+            v = self._memo[key] = fn()
+            return v
+
+
+def memo(item: Dict[str, Any], key: Any, fn: Callable[[], Any]) -> Any:
+    """profile 内部使用：item 是 ItemFeatures 时缓存结果，普通 dict 时直接计算"""
+    if isinstance(item, ItemFeatures):
+        return item.memo(key, fn)
+    return fn()
+
+
+def lower_blob(item: Dict[str, Any], *fields: str) -> str:
+    """' '.join(str(item[f] or '') for f in fields).lower()，按字段组合缓存"""
+    return memo(item, ("blob",) + fields,
+                lambda: " ".join(str(item.get(f) or "") for f in fields).lower())
+
+
+def price_of(prof: Any, f: ItemFeatures) -> Tuple[bool, Optional[float], Optional[str]]:
+    return f.memo(("price", prof.name), lambda: prof.normalize_price(f))
+
+
+_DEDUP_ARITY: Dict[str, int] = {}
+
+
+def dedup_key_of(prof: Any, f: ItemFeatures, entities: Dict[str, Any]) -> str:
+    """
+    缓存每条的去重键。兼容两种 profile 签名：
+    dedup_key(title, d, entities)（DomainProfile）与 dedup_key(title, item)（静态方法版本）。
+    """
+    def compute() -> str:
+        n = _DEDUP_ARITY.get(prof.name)
+        if n is None:
+            try:
+                n = len(inspect.signature(prof.dedup_key).parameters)
+            except (TypeError, ValueError):
+                n = 3
+            _DEDUP_ARITY[prof.name] = n
+        if n >= 3:
+            return prof.dedup_key(f.title, f, entities)
+        return prof.dedup_key(f.title, f)
+    return f.memo(("dedup", prof.name), compute)
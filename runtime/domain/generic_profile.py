@@ -5,6 +5,8 @@ from typing import Dict, Any, List, Tuple, Optional
 
 from .profiles import DomainProfile, register_profile
 
+_RX_WS = re.compile(r"\s+")
+
 class GenericProfile:
     name = "generic"
 
@@ -40,7 +42,7 @@ class GenericProfile:
 
     @staticmethod
     def dedup_key(title: str, item: Dict[str, Any]) -> str:
-        return re.sub(r"\s+", " ", (title or "").lower()).strip()
+        return _RX_WS.sub(" ", (title or "").lower()).strip()
 
     @staticmethod
     def fallback_plan() -> List[str]:
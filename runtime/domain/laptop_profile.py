@@ -4,6 +4,16 @@ import re
 from typing import Dict, Any, List, Tuple, Optional
 
 from .profiles import DomainProfile, register_profile
+from .features import lower_blob
+from runtime.keywords import KeywordMatcher
+
+_RX_MODEL = re.compile(r"(x1\s*carbon|xps\s*\d+|macbook\s*(air|pro)\s*\d*|surface\s*(laptop|book)\s*\d*)")
+_RX_WS = re.compile(r"\s+")
+
+# 常见配件（结果阶段过滤）
+_KW = KeywordMatcher({
+    "accessory": ["sleeve","bag","backpack","dock","docking","stand","cooler","keyboard","mouse","charger","adapter","hub","skin","sticker"],
+})
 
 class LaptopProfile:
     name = "electronics_laptop"
@@ -16,7 +26,7 @@ class LaptopProfile:
         "msi", "acer", "asus", "lenovo", "dell", "hp", "huawei", "xiaomi"
     ]
 
-    CPU_CUES = [r"i[3579]-?\d{3,5}u?", r"ryzen\s?[3579]\s?\d{3,5}", r"apple\s?(m1|m2|m3)\w*"]
+    CPU_CUES = [re.compile(p) for p in (r"i[3579]-?\d{3,5}u?", r"ryzen\s?[3579]\s?\d{3,5}", r"apple\s?(m1|m2|m3)\w*")]
 
     @staticmethod
     def _to_float(x, default=0.0) -> float:
@@ -32,7 +42,7 @@ class LaptopProfile:
         score, ev = 0.0, {"hits": []}
         if any(b in t for b in LaptopProfile.BRANDS):
             score += 0.6; ev["hits"].append("brand")
-        if any(re.search(p, t) for p in LaptopProfile.CPU_CUES):
+        if any(p.search(t) for p in LaptopProfile.CPU_CUES):
             score += 0.3; ev["hits"].append("cpu")
         if "laptop" in t or "notebook" in t or "ultrabook" in t:
             score += 0.2; ev["hits"].append("category")
@@ -54,14 +64,14 @@ class LaptopProfile:
                 brand = b; break
         # 型号粗提（如 x1 carbon / xps 13 / macbook air 15 等）
         model = None
-        m = re.search(r"(x1\s*carbon|xps\s*\d+|macbook\s*(air|pro)\s*\d*|surface\s*(laptop|book)\s*\d*)", t)
+        m = _RX_MODEL.search(t)
         if m: model = m.group(0)
         return {"brand": brand, "model": model}
 
     # ---------- model filter ----------
     @staticmethod
     def filter_model(item: Dict[str, Any], entities: Dict[str, Any], *, strict: bool) -> bool:
-        title = (str(item.get("title") or "") + " " + str(item.get("subtitle") or "")).lower()
+        title = lower_blob(item, "title", "subtitle")
         brand = entities.get("brand")
         model = entities.get("model")
         if brand and brand not in title:
@@ -87,15 +97,14 @@ class LaptopProfile:
     def keep_after_accessory(item: Dict[str, Any], *, is_accessory_intent: bool) -> bool:
         if is_accessory_intent:
             return True
-        t = " ".join([str(item.get("title") or ""), str(item.get("category") or "")]).lower()
+        t = lower_blob(item, "title", "category")
         # 过滤常见配件
-        NEG = ["sleeve","bag","backpack","dock","docking","stand","cooler","keyboard","mouse","charger","adapter","hub","skin","sticker"]
-        return not any(k in t for k in NEG)
+        return not _KW.has(t, "accessory")
 
     # ---------- dedup ----------
     @staticmethod
     def dedup_key(title: str, item: Dict[str, Any]) -> str:
-        return re.sub(r"\s+", " ", (title or "").lower()).strip()
+        return _RX_WS.sub(" ", (title or "").lower()).strip()
 
     # ---------- fallbacks ----------
     @staticmethod
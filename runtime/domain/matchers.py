@@ -0,0 +1,57 @@
+# runtime/domain/matchers.py
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Pattern
+
+
+@lru_cache(maxsize=1024)
+def compiled(pattern: str, flags: int = 0) -> Pattern:
+    """模块级编译缓存（动态拼出来的模式也只编译一次）"""
+    return re.compile(pattern, flags)
+
+
+class EntityMatchers(dict):
+    """
+    entity_extract 的结果 + 按实体特化、预编译好的正则（每个请求构建一次）。
+    本身仍是实体 dict：profile 里 entities.get(...) 照常使用，诊断输出照常序列化。
+    """
+    __slots__ = ("_rx",)
+
+    def __init__(self, entities: Optional[Dict[str, Any]] = None):
+        super().__init__(entities or {})
+        self._rx: Dict[str, Optional[Pattern]] = {}
+
+    def rx(self, name: str, build: Callable[[], Optional[str]], flags: int = 0) -> Optional[Pattern]:
+        try:
+            return self._rx[name]
+        except KeyError:
+            src = build()
+            p = self._rx[name] = compiled(src, flags) if src else None
+            return p
+
+
+def entity_rx(entities: Dict[str, Any], name: str, build: Callable[[], Optional[str]],
+              flags: int = 0) -> Optional[Pattern]:
+    """entities 是 EntityMatchers 时取请求级缓存；普通 dict 时走模块级编译缓存"""
+    if isinstance(entities, EntityMatchers):
+        return entities.rx(name, build, flags)
+    src = build()
+    return compiled(src, flags) if src else None
+
+
+# 代际匹配：iPhone 15 / Galaxy S24
+_GEN_TEMPLATES = {
+    "iphone": r"\biphone\s*{gen}\b",
+    "galaxy": r"\bs\s*-?\s*{gen}\b",
+}
+
+
+def gen_rx(entities: Dict[str, Any], family: str) -> Optional[Pattern]:
+    """family ∈ {iphone, galaxy}；无 gen 实体时返回 None"""
+    def build() -> Optional[str]:
+        gen = entities.get("gen")
+        if not gen or family not in _GEN_TEMPLATES:
+            return None
+        return _GEN_TEMPLATES[family].replace("{gen}", re.escape(str(gen)))
+    return entity_rx(entities, f"gen:{family}", build)
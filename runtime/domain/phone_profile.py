@@ -5,6 +5,38 @@ import hashlib
 from typing import Dict, Any, List, Tuple, Optional
 
 from .profiles import register_profile, DomainProfile
+from .features import memo, lower_blob
+from .matchers import gen_rx
+from runtime.keywords import KeywordMatcher
+
+# 热路径正则：模块加载时编译一次
+_RX_GEN_NUM = re.compile(r"\b(1[0-9])\b")
+_RX_S_GEN_ANY = re.compile(r"\bs\s*-?\s*\d+\b")
+_RX_S_GEN = re.compile(r"\bs\s*-?\s*([0-9]{1,2})\b")
+_RX_PRO_MAX = re.compile(r"\bpro\s*max\b")
+_RX_PRO = re.compile(r"\bpro\b")
+_RX_ULTRA = re.compile(r"\bultra\b")
+_RX_CAPACITY = re.compile(r"\b(64|128|256|512|1024)\s*gb\b")
+_RX_UNLOCKED = re.compile(r"\bunlocked\b|\bsim\s*free\b")
+_RX_INSTALLMENT = re.compile(r"(/mo|per\s*month|\b\d+\s*mo(nths)?\b|\$\s*[\d,.]+\s*/\s*mo)")
+_RX_MONTHLY = re.compile(r"\$?\s*([\d,.]+)\s*(/|per)?\s*mo")
+_RX_MONTHS = re.compile(r"for\s*(\d+)\s*mo(nths)?")
+_RX_DOLLAR = re.compile(r"\$\s*([\d,.]+)")
+_RX_PRDS = re.compile(r"prds=([^&]+)")
+_RX_PID_ENC = re.compile(r"productid%3A([^%,]+)")
+_RX_PID = re.compile(r"productid:([^%,]+)")
+_RX_OFFER_ENC = re.compile(r"headlineOfferDocid%3A([^%,]+)")
+_RX_OFFER = re.compile(r"headlineOfferDocid:([^%,]+)")
+
+# 关键词表（共享匹配器；小表走 C 层子串查找）
+_KW = KeywordMatcher({
+    # 二手/翻新/开箱
+    "condition": ("renewed", "refurb", "pre-owned", "preowned", "used", "open box",
+                  "seller refurbished", "good condition", "fair condition"),
+    # 配件
+    "accessory": ("case", "cover", "magsafe", "screen protector", "tempered", "glass",
+                  "charger", "cable", "adapter", "dock", "stand", "holder", "skin", "sticker", "band", "strap", "watch"),
+})
 
 
 class PhoneProfile(DomainProfile):
@@ -34,22 +66,22 @@ class PhoneProfile(DomainProfile):
             hits.append("family")
 
         # 代际
-        if re.search(r"\b(1[0-9])\b", t) or re.search(r"\bs\s*-?\s*\d+\b", t):
+        if _RX_GEN_NUM.search(t) or _RX_S_GEN_ANY.search(t):
             score += 0.4
             hits.append("gen")
 
         # 后缀
-        if re.search(r"\bpro\s*max\b", t) or "ultra" in t or re.search(r"\bpro\b", t):
+        if _RX_PRO_MAX.search(t) or "ultra" in t or _RX_PRO.search(t):
             score += 0.3
             hits.append("suffix")
 
         # 容量
-        if re.search(r"\b(64|128|256|512|1024)\s*gb\b", t):
+        if _RX_CAPACITY.search(t):
             score += 0.1
             hits.append("capacity")
 
         # 无锁/运营商词
-        if re.search(r"\bunlocked\b|\bsim\s*free\b", t):
+        if _RX_UNLOCKED.search(t):
             score += 0.2
             hits.append("carrier")
 
@@ -92,36 +124,37 @@ class PhoneProfile(DomainProfile):
         ent["family"] = "iphone" if "iphone" in t else ("galaxy" if "galaxy" in t else None)
 
         # iPhone 15 / 16
-        m = re.search(r"\b(1[0-9])\b", t)
+        m = _RX_GEN_NUM.search(t)
         if m and ent["family"] == "iphone":
             ent["gen"] = m.group(1)
 
         # Galaxy S24 -> 24
-        m2 = re.search(r"\bs\s*-?\s*([0-9]{1,2})\b", t)
+        m2 = _RX_S_GEN.search(t)
         if m2 and ent["family"] == "galaxy":
             ent["gen"] = m2.group(1)
 
-        if re.search(r"\bpro\s*max\b", t):
+        if _RX_PRO_MAX.search(t):
             ent["suffix"] = "pro max"
-        elif re.search(r"\bpro\b", t):
+        elif _RX_PRO.search(t):
             ent["suffix"] = "pro"
-        elif re.search(r"\bultra\b", t):
+        elif _RX_ULTRA.search(t):
             ent["suffix"] = "ultra"
 
         cap = None
-        m3 = re.search(r"\b(64|128|256|512|1024)\s*gb\b", t)
+        m3 = _RX_CAPACITY.search(t)
         if m3:
             cap = int(m3.group(1))
         ent["capacity"] = cap
 
-        ent["carrier"] = ("unlocked" if re.search(r"\bunlocked\b|\bsim\s*free\b", t) else None)
+        ent["carrier"] = ("unlocked" if _RX_UNLOCKED.search(t) else None)
         return ent
 
     # -------------------------
     # 型号守门
     # -------------------------
     def filter_model(self, d: Dict[str, Any], entities: Dict[str, Any], strict: bool = True) -> bool:
-        title = f"{d.get('title') or d.get('name') or ''} {d.get('subtitle') or ''}".lower()
+        title = memo(d, "model_blob",
+                     lambda: f"{d.get('title') or d.get('name') or ''} {d.get('subtitle') or ''}".lower())
 
         fam = entities.get("family")
         gen = entities.get("gen")
@@ -130,7 +163,7 @@ class PhoneProfile(DomainProfile):
         if fam == "iphone":
             if "iphone" not in title:
                 return False
-            if gen and not re.search(rf"\biphone\s*{re.escape(gen)}\b", title):
+            if gen and not gen_rx(entities, "iphone").search(title):
                 return False
             if strict and suf:
                 if suf == "pro max" and "pro max" not in title:
@@ -141,7 +174,7 @@ class PhoneProfile(DomainProfile):
         if fam == "galaxy":
             if "galaxy" not in title or "s" not in title:
                 return False
-            if gen and not re.search(rf"\bs\s*-?\s*{re.escape(gen)}\b", title):
+            if gen and not gen_rx(entities, "galaxy").search(title):
                 return False
             if strict and suf:
                 if suf == "ultra" and "ultra" not in title:
@@ -154,17 +187,12 @@ class PhoneProfile(DomainProfile):
     # 返回：(ok, price, reason)
     # -------------------------
     def normalize_price(self, d: Dict[str, Any]) -> Tuple[bool, Optional[float], str]:
-        blob = " ".join([
-            str(d.get("price_str") or ""),
-            str(d.get("priceText") or ""),
-            str(d.get("snippet") or ""),
-            str(d.get("title") or "")
-        ]).lower()
+        blob = lower_blob(d, "price_str", "priceText", "snippet", "title")
 
         # 1) 运营商分期
-        if re.search(r"(/mo|per\s*month|\b\d+\s*mo(nths)?\b|\$\s*[\d,.]+\s*/\s*mo)", blob):
-            m1 = re.search(r"\$?\s*([\d,.]+)\s*(/|per)?\s*mo", blob)
-            m2 = re.search(r"for\s*(\d+)\s*mo(nths)?", blob)
+        if _RX_INSTALLMENT.search(blob):
+            m1 = _RX_MONTHLY.search(blob)
+            m2 = _RX_MONTHS.search(blob)
             if m1 and m2:
                 monthly = float(m1.group(1).replace(",", ""))
                 months = int(m2.group(1))
@@ -172,9 +200,7 @@ class PhoneProfile(DomainProfile):
             return False, None, "installment_only"
 
         # 2) 二手/翻新/开箱（强过滤）
-        NEG_COND = ("renewed", "refurb", "pre-owned", "preowned", "used", "open box",
-                    "seller refurbished", "good condition", "fair condition")
-        if any(k in blob for k in NEG_COND):
+        if _KW.has(blob, "condition"):
             return False, None, "condition_bad"
 
         # 3) 标价解析
@@ -184,7 +210,7 @@ class PhoneProfile(DomainProfile):
             except Exception:
                 pass
 
-        m = re.search(r"\$\s*([\d,.]+)", blob)
+        m = _RX_DOLLAR.search(blob)
         if m:
             try:
                 return True, float(m.group(1).replace(",", "")), "priced_from_blob"
@@ -199,40 +225,38 @@ class PhoneProfile(DomainProfile):
     def keep_after_accessory(self, d: Dict[str, Any], is_accessory_intent: bool = False) -> bool:
         if is_accessory_intent:
             return True
-        t = " ".join([str(d.get("title") or ""), str(d.get("category") or ""), str(d.get("product_type") or "")]).lower()
-        NEG = ("case", "cover", "magsafe", "screen protector", "tempered", "glass",
-               "charger", "cable", "adapter", "dock", "stand", "holder", "skin", "sticker", "band", "strap", "watch")
-        return not any(k in t for k in NEG)
+        t = lower_blob(d, "title", "category", "product_type")
+        return not _KW.has(t, "accessory")
 
     # -------------------------
     # 去重键（引入 productid/offer_docid；回退 url_hash）
     # -------------------------
     def parse_docids(self, url: str) -> Tuple[Optional[str], Optional[str]]:
         # 形如 prds=productid:XXX,headlineOfferDocid:YYY,imageDocid:...
-        m = re.search(r"prds=([^&]+)", url)
+        m = _RX_PRDS.search(url)
         if not m:
             return None, None
         blob = m.group(1)
         pid = None
         offer = None
-        m1 = re.search(r"productid%3A([^%,]+)", blob) or re.search(r"productid:([^%,]+)", blob)
+        m1 = _RX_PID_ENC.search(blob) or _RX_PID.search(blob)
         if m1:
             pid = m1.group(1)
-        m2 = re.search(r"headlineOfferDocid%3A([^%,]+)", blob) or re.search(r"headlineOfferDocid:([^%,]+)", blob)
+        m2 = _RX_OFFER_ENC.search(blob) or _RX_OFFER.search(blob)
         if m2:
             offer = m2.group(1)
         return pid, offer
 
     def dedup_key(self, title: str, d: Dict[str, Any], entities: Dict[str, Any]) -> str:
         url = str(d.get("url") or "")
-        pid, offer = self.parse_docids(url)
+        pid, offer = memo(d, "docids", lambda: self.parse_docids(url))
         # 规格归一
         brand = "apple" if "iphone" in title.lower() else ("samsung" if "galaxy" in title.lower() else entities.get("brand") or "")
         fam = entities.get("family") or ""
         gen = entities.get("gen") or ""
         suf = entities.get("suffix") or ""
         cap = str(entities.get("capacity") or "")
-        carrier = "unlocked" if re.search(r"\bunlocked\b|\bsim\s*free\b", title.lower()) else (entities.get("carrier") or "")
+        carrier = "unlocked" if _RX_UNLOCKED.search(title.lower()) else (entities.get("carrier") or "")
         vendor_sig = offer or pid or hashlib.md5(url.encode("utf-8")).hexdigest()[:10]
         return "|".join([brand, fam, str(gen), suf, cap, carrier, vendor_sig])
 
@@ -253,7 +277,7 @@ class PhoneProfile(DomainProfile):
     # -------------------------
     def soft_score(self, d: Dict[str, Any], entities: Dict[str, Any], has_total_price: bool) -> float:
         score = 0.0
-        title = f"{d.get('title') or ''} {d.get('subtitle') or ''}".lower()
+        title = lower_blob(d, "title", "subtitle")
         if entities.get("suffix") == "pro max" and "pro max" in title:
             score += 1.5
         if entities.get("suffix") == "ultra" and "ultra" in title:
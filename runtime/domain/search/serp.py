@@ -1,16 +1,14 @@
 # runtime/search/serp.py
 import os
-import requests
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from providers.serpapi import search_json, search_json_sync
 
 SERPAPI_KEY = os.getenv("SERPAPI_KEY", "")
 
-def google_shopping(query: str, location: str = "Australia", gl: str = "us", hl: str = "en") -> Dict[str, Any]:
-    """
-    Query SerpAPI Google Shopping. Returns parsed JSON dict.
-    """
-    url = "https://serpapi.com/search.json"
-    params = {
+def _params(query: str, location: str, gl: str, hl: str) -> Dict[str, Any]:
+    return {
         "engine": "google_shopping",
         "q": query,
         "location": location,
@@ -22,33 +20,83 @@ def google_shopping(query: str, location: str = "Australia", gl: str = "us", hl:
         "safe": "active",
         "udm": "28",
     }
-    r = requests.get(url, params=params, timeout=25)
-    r.raise_for_status()
-    return r.json()
 
-def map_items(serp: Dict[str, Any]) -> List[Dict[str, Any]]:
+def google_shopping(query: str, location: str = "Australia", gl: str = "us", hl: str = "en") -> Dict[str, Any]:
     """
-    Map SerpAPI shopping_results to a normalized list.
+    Query SerpAPI Google Shopping. Returns parsed JSON dict.
+    """
+    return search_json_sync(_params(query, location, gl, hl), endpoint="domain_serp", timeout=25)
+
+async def google_shopping_async(query: str, location: str = "Australia", gl: str = "us", hl: str = "en") -> Dict[str, Any]:
+    """
+    Async version of google_shopping (shared connection pool, cache, single-flight).
     """
-    out = []
-    for it in serp.get("shopping_results", [])[:40]:
-        title = it.get("title") or ""
-        link  = it.get("product_link") or it.get("link") or ""
+    return await search_json(_params(query, location, gl, hl), endpoint="domain_serp")
+
+async def google_shopping_batch(queries: List[str], *, concurrency: int = 4, location: str = "Australia",
+                                gl: str = "us", hl: str = "en") -> List[Dict[str, Any]]:
+    """
+    Run several queries concurrently (at most `concurrency` in flight).
+    Results keep the order of `queries`; a failed query yields {"error": "..."}.
+    """
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def one(q: str) -> Dict[str, Any]:
+        async with sem:
+            try:
+                return await google_shopping_async(q, location=location, gl=gl, hl=hl)
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}"}
+
+    return list(await asyncio.gather(*[one(q) for q in queries]))
+
+def iter_items(serp: Dict[str, Any], *, keep_raw: bool = False, limit: int = 40) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily map SerpAPI shopping_results to normalized dicts.
+    The raw result is attached only when keep_raw=True.
+    """
+    for it in (serp.get("shopping_results") or [])[:limit]:
         price = it.get("extracted_price")
         currency = None
         # Serp 没直接给 currency；简单从字符串 price 里猜（足够用于过滤）
         price_str = it.get("price") or ""
         if "AED" in price_str: currency = "AED"
         elif "$" in price_str: currency = "USD"  # 你的 gl=us + google.com 大多是 $
-        provider = (it.get("source") or "").lower()
         install = it.get("installment", {})
-        out.append({
-            "title": title,
-            "url": link,
+        out = {
+            "title": it.get("title") or "",
+            "url": it.get("product_link") or it.get("link") or "",
             "price": price,
             "currency": currency,
-            "provider": provider,
-            "raw": it,
+            "provider": (it.get("source") or "").lower(),
             "installment_only": bool(install and not price),  # 极端兜底
-        })
-    return out
+        }
+        if keep_raw:
+            out["raw"] = it
+        yield out
+
+def map_items(serp: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Map SerpAPI shopping_results to a normalized list.
+    """
+    return list(iter_items(serp, keep_raw=True))
+
+def iter_batch_items(serps: Iterable[Dict[str, Any]], *, keep_raw: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Chain the mapped items of a batch (query order), tagging each with its query index.
+    """
+    for idx, serp in enumerate(serps):
+        for item in iter_items(serp, keep_raw=keep_raw):
+            item["query_index"] = idx
+            yield item
+
+async def search_profile_queries(prof: Any, text: str, prefs: Optional[Dict[str, Any]] = None, *,
+                                 concurrency: int = 4, keep_raw: bool = False,
+                                 location: str = "Australia", gl: str = "us", hl: str = "en") -> Iterator[Dict[str, Any]]:
+    """
+    Issue all query variants of a domain profile (e.g. up to 6 for cosmetics) in one batch
+    and return an iterator over their mapped items.
+    """
+    queries = prof.preprocess_queries(text, dict(prefs or {}))
+    serps = await google_shopping_batch(queries, concurrency=concurrency, location=location, gl=gl, hl=hl)
+    return iter_batch_items(serps, keep_raw=keep_raw)
@@ -1,9 +1,10 @@
 # agent/runtime/executor.py
 import asyncio
 import time
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 from pydantic import ValidationError
 from .tool_schemas import ToolRegistry
+from . import request_stats
 from .trace import Span, Trace
 from .validators import basic_struct_checks
 
@@ -27,56 +28,108 @@ class Executor:
             return await res
         return res
 
-    async def run_plan(self, plan, trace: Trace) -> Tuple[Any, Trace]:
-        last_output = None
-        ctx = ExecContext()
+    @staticmethod
+    def _deps_of(plan) -> List[List[int]]:
+        """每步的直接依赖；depends_on 为 None 时依赖上一步（保持原先的顺序链语义）"""
+        deps: List[List[int]] = []
         for idx, step in enumerate(plan.steps):
-            spec = ToolRegistry.get(step.tool_name)
-            if not spec:
-                raise ExecutionError(f"Tool not registered: {step.tool_name}")
-
-            fn = self.impl.get(step.tool_name)
-            if not fn:
-                raise ExecutionError(f"Tool impl missing: {step.tool_name}")
-
-            # 入参校验
-            try:
-                input_obj = spec.input_model(**step.inputs)
-            except ValidationError as e:
-                raise ExecutionError(f"Input validation failed for {step.tool_name}: {e}") from e
-
-            # 执行 + 计时
-            span = Span(tool=step.tool_name, inputs=step.inputs)
-            t0 = time.time()
-            out = await self._maybe_await(fn, input_obj, ctx)
-            span.end(time.time() - t0)
-
-            # 统一成 dict 再做出参校验（兼容 pydantic v1/v2）
-            if hasattr(out, "model_dump"):
-                out_dict = out.model_dump()
-            elif hasattr(out, "dict"):
-                out_dict = out.dict()
-            elif isinstance(out, dict):
-                out_dict = out
-            else:
-                out_dict = out.__dict__
-
-            try:
-                output_obj = spec.output_model(**out_dict)
-            except ValidationError as e:
-                raise ExecutionError(f"Output validation failed for {step.tool_name}: {e}") from e
-
-            basic_struct_checks(step.tool_name, output_obj)
-
-            span.out_summary = {
-                "size": len(getattr(output_obj, "items", []) or []),
-                "keys": list(getattr(output_obj, "model_dump", getattr(output_obj, "dict", lambda: {}) )().keys())
-                if hasattr(output_obj, "model_dump") or hasattr(output_obj, "dict") else []
-            }
-            trace.add(span)
-
-            # 写入上下文，供下一步使用
-            ctx[f"step_{idx}_output"] = output_obj
-            last_output = output_obj
+            d = getattr(step, "depends_on", None)
+            if d is None:
+                d = [idx - 1] if idx > 0 else []
+            d = sorted(set(int(i) for i in d))
+            for i in d:
+                if not 0 <= i < idx:
+                    raise ExecutionError(f"Step {idx} ({step.tool_name}) depends on invalid step {i}")
+            deps.append(d)
+        return deps
+
+    async def _run_step(self, idx: int, step, ctx: ExecContext) -> Tuple[Any, Span]:
+        spec = ToolRegistry.get(step.tool_name)
+        if not spec:
+            raise ExecutionError(f"Tool not registered: {step.tool_name}")
+
+        fn = self.impl.get(step.tool_name)
+        if not fn:
+            raise ExecutionError(f"Tool impl missing: {step.tool_name}")
+
+        # 入参校验
+        try:
+            input_obj = spec.input_model(**step.inputs)
+        except ValidationError as e:
+            raise ExecutionError(f"Input validation failed for {step.tool_name}: {e}") from e
+
+        # 执行 + 计时（只计本步自身耗时，不含等待依赖）
+        span = Span(tool=step.tool_name, inputs=step.inputs)
+        t0 = time.time()
+        out = await self._maybe_await(fn, input_obj, ctx)
+        span.end(time.time() - t0)
+
+        # 统一成 dict 再做出参校验（兼容 pydantic v1/v2）
+        if hasattr(out, "model_dump"):
+            out_dict = out.model_dump()
+        elif hasattr(out, "dict"):
+            out_dict = out.dict()
+        elif isinstance(out, dict):
+            out_dict = out
+        else:
+            out_dict = out.__dict__
+
+        # 出参校验即 /agent 路径上条目的边界校验，计入 items.validated / validate_us
+        t1 = time.perf_counter()
+        try:
+            output_obj = spec.output_model(**out_dict)
+        except ValidationError as e:
+            raise ExecutionError(f"Output validation failed for {step.tool_name}: {e}") from e
+        n_items = len(getattr(output_obj, "items", None) or [])
+        if n_items:
+            request_stats.incr("items.validated", n_items)
+            request_stats.incr("items.validate_us", int((time.perf_counter() - t1) * 1e6))
+
+        basic_struct_checks(step.tool_name, output_obj)
+
+        span.out_summary = {
+            "size": len(getattr(output_obj, "items", []) or []),
+            "keys": list(getattr(output_obj, "model_dump", getattr(output_obj, "dict", lambda: {}) )().keys())
+            if hasattr(output_obj, "model_dump") or hasattr(output_obj, "dict") else []
+        }
+        return output_obj, span
+
+    async def run_plan(self, plan, trace: Trace) -> Tuple[Any, Trace]:
+        """
+        按依赖图执行：每步在其 depends_on 全部完成后启动，互不依赖的步骤并发执行
+        （如多 region 搜索）。每步拿到的 ctx 只包含其直接依赖的 step_{i}_output。
+        span 按计划顺序写入 trace；任一步失败则取消其余步骤并抛出（按计划顺序第一个失败）。
+        """
+        steps = list(plan.steps)
+        deps = self._deps_of(plan)
+        outputs: Dict[int, Any] = {}
+        spans: Dict[int, Span] = {}
+        tasks: List["asyncio.Task"] = []
+
+        async def run(idx: int):
+            if deps[idx]:
+                await asyncio.gather(*(tasks[i] for i in deps[idx]))
+            ctx = ExecContext({f"step_{i}_output": outputs[i] for i in deps[idx]})
+            output_obj, span = await self._run_step(idx, steps[idx], ctx)
+            outputs[idx] = output_obj
+            spans[idx] = span
+
+        for idx in range(len(steps)):
+            tasks.append(asyncio.create_task(run(idx)))
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                failed = [t for t in tasks if t in done and not t.cancelled() and t.exception() is not None]
+                if failed:
+                    failed[0].result()   # 抛出（按计划顺序第一个失败的步骤）
+        finally:
+            for t in tasks:
+                t.cancel()
+            # 收回已取消/失败任务的异常，避免 "exception was never retrieved"
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for idx in sorted(spans):
+                trace.add(spans[idx])
 
+        last_output = outputs[len(steps) - 1] if steps else None
         return last_output, trace
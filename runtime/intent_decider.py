@@ -3,6 +3,8 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, Tuple
 
+from runtime.keywords import KeywordMatcher
+
 # -------- Accessory detection (English) --------
 ACCESSORY_KEYWORDS = [
     "case", "cover", "magsafe", "screen protector", "tempered glass",
@@ -12,7 +14,7 @@ ACCESSORY_KEYWORDS = [
 
 def looks_like_accessory_query(text: str) -> bool:
     t = (text or "").lower()
-    return any(k in t for k in ACCESSORY_KEYWORDS)
+    return _KW.has(t, "accessory")
 
 # -------- Very-light domain detector (English) --------
 def auto_detect_domain(text: str) -> Tuple[str, float, Dict[str, Any]]:
@@ -24,11 +26,7 @@ def auto_detect_domain(text: str) -> Tuple[str, float, Dict[str, Any]]:
     score = 0.0
     ev = {"hits": []}
 
-    brands = [
-        "iphone", "galaxy", "pixel", "oneplus", "xiaomi", "redmi",
-        "huawei", "mate", "poco", "oppo", "vivo", "nothing phone"
-    ]
-    if any(b in t for b in brands):
+    if _KW.has(t, "brand"):
         score += 0.7; ev["hits"].append("brand")
 
     if re.search(r"\biphone\s*1[0-9]\b", t):
@@ -57,6 +55,19 @@ RECO_KEYWORDS = [
     "recommend", "best ", "which", "versus", " vs ", "compare ", "for "
 ]
 
+PHONE_BRANDS = [
+    "iphone", "galaxy", "pixel", "oneplus", "xiaomi", "redmi",
+    "huawei", "mate", "poco", "oppo", "vivo", "nothing phone"
+]
+
+# 所有关键词集合交给同一个匹配器：scan 拿到各集合命中的词（同时作为 evidence）
+_KW = KeywordMatcher({
+    "accessory": ACCESSORY_KEYWORDS,
+    "brand": PHONE_BRANDS,
+    "price": PRICE_KEYWORDS,
+    "reco": RECO_KEYWORDS,
+})
+
 def decide_intent(
     text: str,
     prefs: Dict[str, Any] | None = None,
@@ -68,29 +79,29 @@ def decide_intent(
       planner_intent: "price" | "recommend"
     """
     t = (text or "").lower()
+    kw = _KW.scan(t)
 
     price_score = 0.0
-    for k in PRICE_KEYWORDS:
-        if k in t:
-            price_score += 0.3
+    for _ in kw.get("price", ()):
+        price_score += 0.3
 
     reco_score = 0.0
-    for k in RECO_KEYWORDS:
-        if k in t:
-            reco_score += 0.25
+    for _ in kw.get("reco", ()):
+        reco_score += 0.25
 
     # Specificity boosts
     if re.search(r"\b(iphone|galaxy|pixel|oneplus)\b", t) and re.search(r"\b(1[0-9]|s[2-9][0-9]|[4-9])\b", t):
         price_score += 0.3  # concrete model → price leaning
 
     # Accessory flag & domain
-    is_acc = looks_like_accessory_query(text)
+    is_acc = "accessory" in kw
     domain, d_score, d_ev = auto_detect_domain(text)
 
     evidence: Dict[str, Any] = {
         "price_score": round(price_score, 2),
         "reco_score": round(reco_score, 2),
         "flags": {"is_accessory": is_acc},
+        "keywords": kw,
         "domain_probe": {"domain": domain, "score": d_score, "evidence": d_ev},
         "decision": None
     }
@@ -0,0 +1,132 @@
+# runtime/keywords.py
+from __future__ import annotations
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _ac_min_size() -> int:
+    try:
+        return max(1, int(os.getenv("AGENT_KEYWORD_AC_MIN", "128")))
+    except Exception:
+        return 128
+
+
+class _AhoCorasick:
+    """
+    Aho-Corasick 自动机：多个命名关键词集合编进同一个自动机，对文本只扫一遍。
+    纯 Python 逐字符推进，只在关键词很多时才比 C 层的 `k in text` 循环快。
+    """
+
+    def __init__(self, sets: Dict[str, Tuple[str, ...]]):
+        self.sets = sets
+        # 关键词 id → (集合名, 在该集合中的序号)；同一个词可属于多个集合
+        self._kw: List[Tuple[str, int]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Tuple[int, ...]] = [()]
+        fail: List[int] = [0]
+
+        for name, words in sets.items():
+            for idx, word in enumerate(words):
+                if not word:
+                    continue
+                node = 0
+                for ch in word:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][ch] = nxt
+                        self._goto.append({})
+                        self._out.append(())
+                        fail.append(0)
+                    node = nxt
+                self._out[node] += (len(self._kw),)
+                self._kw.append((name, idx))
+
+        # BFS 建 fail 指针，并把 fail 链上的输出并入当前结点
+        goto = self._goto
+        queue = deque(goto[0].values())      # 第一层的 fail 指向根
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                self._out[nxt] += self._out[fail[nxt]]
+        self._fail = fail
+
+    def _iter_hits(self, text: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield out[node]
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        ids = set()
+        for hit in self._iter_hits(text):
+            ids.update(hit)
+        found: Dict[str, List[int]] = {}
+        for i in ids:
+            name, idx = self._kw[i]
+            found.setdefault(name, []).append(idx)
+        return {name: [self.sets[name][i] for i in sorted(idxs)] for name, idxs in found.items()}
+
+    def has(self, text: str, name: str) -> bool:
+        kw = self._kw
+        for hit in self._iter_hits(text):
+            for i in hit:
+                if kw[i][0] == name:
+                    return True
+        return False
+
+
+class KeywordMatcher:
+    """
+    多个命名关键词集合的共享匹配器（子串语义，与 `k in text` 一致），命中的关键词可作为 evidence。
+    - 小集合（< AGENT_KEYWORD_AC_MIN，默认 128 个词）直接用 C 层的 `k in text` 循环，逐条过滤的热路径最快
+    - 大集合（品牌/类目表扩到成百上千条）编进同一个 Aho-Corasick 自动机，扫描代价与词表大小无关
+
+    关键词按原样匹配（不做大小写转换），调用方传入已小写的文本即可。
+    """
+
+    def __init__(self, sets: Dict[str, Iterable[str]], ac_min_size: Optional[int] = None):
+        self.sets: Dict[str, Tuple[str, ...]] = {name: tuple(w for w in words if w) for name, words in sets.items()}
+        threshold = _ac_min_size() if ac_min_size is None else max(1, int(ac_min_size))
+        large = {name: words for name, words in self.sets.items() if len(words) >= threshold}
+        self._ac = _AhoCorasick(large) if large else None
+        self._small = {name: words for name, words in self.sets.items() if name not in large}
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """返回 {集合名: [命中的关键词（按集合内原顺序）]}；没命中的集合不出现"""
+        text = text or ""
+        found: Dict[str, List[str]] = {}
+        for name, words in self._small.items():
+            hits = [k for k in words if k in text]
+            if hits:
+                found[name] = hits
+        if self._ac is not None:
+            found.update(self._ac.scan(text))
+        return {name: found[name] for name in self.sets if name in found}
+
+    def has(self, text: str, name: str) -> bool:
+        """集合 name 中是否有任一关键词出现；等价于 any(k in text for k in sets[name])"""
+        text = text or ""
+        words = self._small.get(name)
+        if words is not None:
+            return any(k in text for k in words)
+        return self._ac.has(text, name) if self._ac is not None else False
+
+    def first(self, text: str, name: str) -> Optional[str]:
+        """集合 name 中按列表顺序第一个出现的关键词；等价于 next(k for k in sets[name] if k in text)"""
+        text = text or ""
+        words = self._small.get(name)
+        if words is not None:
+            return next((k for k in words if k in text), None)
+        hits = self._ac.scan(text).get(name) if self._ac is not None else None
+        return hits[0] if hits else None
@@ -7,6 +7,8 @@ class Step(BaseModel):
     tool_name: str
     inputs: Dict[str, Any]
     success_criteria: Optional[str] = None
+    # 依赖的前序步骤下标；None = 依赖上一步（顺序链），[] = 无依赖（可与其它步骤并发）
+    depends_on: Optional[List[int]] = None
 
 class Plan(BaseModel):
     steps: List[Step]
@@ -27,26 +29,34 @@ class Planner:
         steps: List[Step] = []
         # 优先：若多步工具齐全，则直接返回多步流水线
         if q.intent in ("price", "compare", "price_compare") and all(name in ToolRegistry for name in ("price.search", "normalize.fx_tax", "merge.rank")):
-            steps.append(Step(
-                tool_name="price.search",
-                inputs={
-                    "query": q.text,
-                    "providers": q.prefs.get("providers", ["mock_a", "mock_b"]),
-                    "limit": int(q.prefs.get("search_limit", 20)),
-                },
-            ))
+            # prefs.regions 给出多个区域时：每个区域一步搜索（互不依赖，并发执行），归一化步骤汇合
+            regions = [str(r) for r in (q.prefs.get("regions") or []) if r] or [q.prefs.get("region", "AU")]
+            for region in regions:
+                steps.append(Step(
+                    tool_name="price.search",
+                    inputs={
+                        "query": q.text,
+                        "providers": q.prefs.get("providers", ["google_shopping"]),
+                        "limit": int(q.prefs.get("search_limit", 20)),
+                        "provider_config": q.prefs.get("synthetic") or {},
+                        "region": region,
+                    },
+                    depends_on=[] if len(regions) > 1 else None,
+                ))
             steps.append(Step(
                 tool_name="normalize.fx_tax",
                 inputs={
                     "target": q.prefs.get("currency", "AUD"),
                     "region": q.prefs.get("region", "AU"),
                 },
+                depends_on=list(range(len(regions))) if len(regions) > 1 else None,
             ))
             steps.append(Step(
                 tool_name="merge.rank",
                 inputs={
                     "strategy": q.prefs.get("strategy", "best_total_cost"),
                     "dedup": q.prefs.get("dedup", "exact"),
+                    "topk": q.prefs.get("max_results"),
                 },
             ))
             return Plan(steps=steps, rationale="Multi-step: search -> normalize -> merge&rank.", risks=["provider timeout", "low precision intent"])
@@ -0,0 +1,27 @@
+# agent/runtime/request_stats.py
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# 请求级计数器：agent_entry 在入口处 begin()，下游（provider / cache 等）随手 incr()，
+# 最终汇总进 trace.metrics。子任务（asyncio.create_task / to_thread）会继承同一个 dict。
+_CURRENT: ContextVar[Optional[Dict[str, float]]] = ContextVar("agent_request_stats", default=None)
+
+
+def begin() -> Dict[str, float]:
+    stats: Dict[str, float] = {}
+    _CURRENT.set(stats)
+    return stats
+
+
+def incr(key: str, n: float = 1) -> None:
+    stats = _CURRENT.get()
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + n
+
+
+def snapshot(prefix: str = "") -> Dict[str, float]:
+    """返回当前请求的计数；给定 prefix 时只取该前缀并去掉前缀。"""
+    stats = _CURRENT.get() or {}
+    if not prefix:
+        return dict(stats)
+    return {k[len(prefix):]: v for k, v in stats.items() if k.startswith(prefix)}
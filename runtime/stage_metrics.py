@@ -0,0 +1,111 @@
+# runtime/stage_metrics.py
+import os
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+# price_compare_full 各过滤阶段的耗时直方图 + 通过/淘汰计数（按 domain × stage 聚合，跨请求累计），
+# 以 Prometheus 文本格式暴露给 /metrics 抓取。
+
+STAGES = ("model", "relax", "softscore", "pricing", "accessory", "dedup")
+
+# 秒；单阶段通常在亚毫秒到几十毫秒之间
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count", "items_in", "items_out")
+
+    def __init__(self, n_buckets: int):
+        self.counts: List[int] = [0] * (n_buckets + 1)   # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.items_in = 0
+        self.items_out = 0
+
+
+class StageMetrics:
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StageMetrics":
+        enabled = str(os.getenv("AGENT_STAGE_METRICS", "1")).lower() in ("1", "true", "yes")
+        return cls(enabled=enabled)
+
+    def observe(self, domain: str, stage: str, seconds: float, n_in: int, n_out: int) -> None:
+        """记录一次阶段执行：耗时（秒）、进入条数、通过条数（淘汰 = 进入 - 通过）"""
+        if not self.enabled:
+            return
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            s = self._series.get((domain, stage))
+            if s is None:
+                s = self._series[(domain, stage)] = _Series(len(self.buckets))
+            s.counts[idx] += 1
+            s.sum += seconds
+            s.count += 1
+            s.items_in += int(n_in)
+            s.items_out += int(n_out)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{domain: {stage: {count, avg_ms, items_in, passed, dropped, pass_ratio}}}"""
+        out: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            for (domain, stage), s in sorted(self._series.items()):
+                out.setdefault(domain, {})[stage] = {
+                    "count": s.count,
+                    "avg_ms": round(s.sum / s.count * 1000.0, 4) if s.count else 0.0,
+                    "items_in": s.items_in,
+                    "passed": s.items_out,
+                    "dropped": s.items_in - s.items_out,
+                    "pass_ratio": round(s.items_out / s.items_in, 4) if s.items_in else 0.0,
+                }
+        return out
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            series = sorted((k, (list(s.counts), s.sum, s.count, s.items_in, s.items_out))
+                            for k, s in self._series.items())
+        lines = [
+            "# HELP agent_compare_stage_seconds Time spent in each price_compare_full filter stage.",
+            "# TYPE agent_compare_stage_seconds histogram",
+        ]
+        for (domain, stage), (counts, total, n, _, _) in series:
+            lbl = f'domain="{_esc(domain)}",stage="{_esc(stage)}"'
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                lines.append(f'agent_compare_stage_seconds_bucket{{{lbl},le="{le:g}"}} {acc}')
+            lines.append(f'agent_compare_stage_seconds_bucket{{{lbl},le="+Inf"}} {acc + counts[-1]}')
+            lines.append(f"agent_compare_stage_seconds_sum{{{lbl}}} {total:.9f}")
+            lines.append(f"agent_compare_stage_seconds_count{{{lbl}}} {n}")
+        lines += [
+            "# HELP agent_compare_stage_items_total Items entering / passing / dropped by each filter stage.",
+            "# TYPE agent_compare_stage_items_total counter",
+        ]
+        for (domain, stage), (_, _, _, n_in, n_out) in series:
+            lbl = f'domain="{_esc(domain)}",stage="{_esc(stage)}"'
+            lines.append(f'agent_compare_stage_items_total{{{lbl},outcome="in"}} {n_in}')
+            lines.append(f'agent_compare_stage_items_total{{{lbl},outcome="passed"}} {n_out}')
+            lines.append(f'agent_compare_stage_items_total{{{lbl},outcome="dropped"}} {n_in - n_out}')
+        lines += [
+            "# HELP agent_compare_stage_pass_ratio Cumulative fraction of items passing each filter stage.",
+            "# TYPE agent_compare_stage_pass_ratio gauge",
+        ]
+        for (domain, stage), (_, _, _, n_in, n_out) in series:
+            lbl = f'domain="{_esc(domain)}",stage="{_esc(stage)}"'
+            lines.append(f"agent_compare_stage_pass_ratio{{{lbl}}} {(n_out / n_in) if n_in else 0.0:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+stage_metrics = StageMetrics.from_env()
@@ -5,8 +5,10 @@ from pydantic import BaseModel, Field, validator
 # ====== 输入/输出 Schema ======
 class PriceSearchInput(BaseModel):
     query: str
-    providers: List[str] = Field(default_factory=lambda: ["mock_a", "mock_b"])
+    providers: List[str] = Field(default_factory=lambda: ["google_shopping"])
     limit: int = 20
+    provider_config: Dict[str, Any] = {}   # 合成 provider 参数等（见 providers/registry.py）
+    region: str = "AU"
 
 class PriceItem(BaseModel):
     title: str
@@ -27,16 +29,18 @@ class PriceSearchOutput(BaseModel):
 class MergeRankInput(BaseModel):
     strategy: Literal["best_total_cost", "best_price"] = "best_total_cost"
     dedup: Literal["exact", "semantic"] = "exact"
+    topk: Optional[int] = None   # 只返回前 K（None = 全部）
 
 class MergeRankOutput(BaseModel):
     items: List[PriceItem]
 
 class NormalizeFxTaxInput(BaseModel):
     target: str = "AUD"
-    region: str = "AU"
+    region: str = "AU"   # 预留；税费按条目来源报价，不按此区域重算
 
 class NormalizeFxTaxOutput(BaseModel):
     items: List[PriceItem]
+    unconvertible: Dict[str, int] = {}      # 无汇率而丢弃的条目数（按原币种）
 
 class RecommendInput(BaseModel):
     goal: str
@@ -1,6 +1,10 @@
 # agent/tools_impl.py
 from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+import os
 import re
+import time
+import asyncio
 
 from runtime.tool_schemas import (
     register_tool,
@@ -14,13 +18,22 @@ from runtime.tool_schemas import (
     RecommendInput, RecommendOutput, RecommendItem,
 )
 
-from orchestrator import PriceCompareOrchestrator
+import json
+from orchestrator import PriceCompareOrchestrator, canonical_key
 from providers.google_shopping import GoogleShoppingProvider
-from models import CompareQuery, CompareResult
-from recommender.recommend_agent import generate_recommendations
+from providers.registry import resolve_providers, normalize_request
+from providers.fx import current_fx, region_currency
+from ranking import top_k, rank_key
+from models import CompareQuery, CompareResult, item_fields
+from recommender.recommend_agent import generate_recommendations_async
 
 # Profile Registry
 from runtime.domain.profiles import get_profile, auto_detect
+from runtime.domain.matchers import EntityMatchers, gen_rx
+from runtime.domain.features import ItemFeatures, memo, lower_blob, price_of, dedup_key_of
+from runtime import request_stats
+from runtime.diagnostics import diag_ring
+from runtime.stage_metrics import stage_metrics
 from runtime.domain import phone_profile as _load_phone_profile  # noqa: F401
 from runtime.domain import generic_profile as _load_generic_profile  # noqa: F401
 from runtime.domain import laptop_profile as _load_laptop_profile  # noqa: F401
@@ -36,6 +49,22 @@ register_tool("reco.generate",      RecommendInput,    RecommendOutput,  "Genera
 
 _providers = [GoogleShoppingProvider()]
 _orc = PriceCompareOrchestrator(providers=_providers)
+_orc_cache: Dict[str, PriceCompareOrchestrator] = {}
+
+def orchestrator_for(names: Optional[List[str]], config: Optional[Dict[str, Any]] = None) -> PriceCompareOrchestrator:
+    """按 prefs.providers（+ 合成 provider 参数）取 orchestrator；未指定时用默认 Google。"""
+    if not names:
+        return _orc
+    names, config = normalize_request(names, config)   # 合成 provider 开关 + 限幅，同时稳定缓存 key
+    if not names:
+        return _orc
+    key = json.dumps([names, config], sort_keys=True, default=str)
+    orc = _orc_cache.get(key)
+    if orc is None:
+        if len(_orc_cache) >= 64:
+            _orc_cache.clear()
+        orc = _orc_cache[key] = PriceCompareOrchestrator(providers=resolve_providers(names, config))
+    return orc
 
 def _to_float(x, default=0.0) -> float:
     try:
@@ -43,6 +72,20 @@ def _to_float(x, default=0.0) -> float:
     except Exception:
         return default
 
+def _compare_stream_enabled(prefs: Dict[str, Any]) -> bool:
+    """prefs.stream 优先，其次 AGENT_COMPARE_STREAM（默认关闭）"""
+    flag = prefs.get("stream")
+    if flag is None:
+        flag = os.getenv("AGENT_COMPARE_STREAM", "0")
+    return str(flag).lower() in ("1", "true", "yes")
+
+def _query_round_width(prefs: Dict[str, Any]) -> int:
+    """并发查询轮数：prefs.query_round_width 优先，其次 AGENT_QUERY_ROUND_WIDTH（默认 1 = 串行）"""
+    try:
+        return max(1, int(prefs.get("query_round_width") or os.getenv("AGENT_QUERY_ROUND_WIDTH", "1")))
+    except Exception:
+        return 1
+
 def _first_nonempty(d: Dict[str, Any], *keys) -> Optional[Any]:
     for k in keys:
         if k in d and d[k] not in (None, "", []):
@@ -57,6 +100,9 @@ async def price_compare_full(inp: CompareFullInput, ctx: Dict[str, Any]) -> Comp
 
     prefs = dict(inp.prefs or {})
     DEBUG = bool(prefs.get("debug"))
+    # 服务端抽样：抽中的请求也收集完整阶段记录（存入诊断环形缓冲；仅 DEBUG 时随响应内联返回）
+    SAMPLED = diag_ring.sample()
+    RECORD = DEBUG or SAMPLED
     def dbg(*args):
         if DEBUG:
             print("[COMPARE-DEBUG]", *args)
@@ -71,34 +117,15 @@ async def price_compare_full(inp: CompareFullInput, ctx: Dict[str, Any]) -> Comp
         prefs["domain"] = domain_name
 
     is_accessory_intent = bool(prefs.get("is_accessory") or False)
+    orc = orchestrator_for(prefs.get("providers"), prefs.get("synthetic"))
     queries = prof.preprocess_queries(inp.text, prefs)
     dbg("queries =", queries)
 
-    # 抓取
-    all_raw, round_sizes = [], []
-    async def run_query(q_text: str):
-        q = CompareQuery(text=q_text, region=inp.region, currency=inp.currency, prefs=prefs)
-        res: CompareResult = await _orc.run(q)
-        round_sizes.append(len(res.items))
-        all_raw.extend(res.items)
-        dbg(f"query='{q_text[:80]}...' -> got {len(res.items)}")
+    # 实体 + 按实体预编译的匹配器（本请求内所有条目共用）
+    entities = EntityMatchers(prof.entity_extract(inp.text))
 
-    for q_text in queries:
-        await run_query(q_text)
-        if len(all_raw) >= MIN_RESULTS:
-            break
-
-    diag: Dict[str, Any] = {
-        "domain": domain_name, "raw": len(all_raw), "round_sizes": round_sizes,
-        "kept_after_model": None, "kept_after_pricing": None, "kept_after_accessory": None,
-        "kept_after_dedup": None, "final": None,
-        "reasons": {
-            "model_mismatch": 0, "installment_only": 0, "accessory": 0,
-            "missing_required": 0, "missing_price": 0, "condition_bad": 0
-        },
-        "fallbacks": [],
-        "auto_detect": {"score": auto_score, "evidence": auto_ev} if auto_ev else {},
-        "debug": {
+    def new_debug() -> Dict[str, Any]:
+        return {
             "queries": queries,
             "stage_records": {
                 "model_drop": [], "pricing_drop": [], "accessory_drop": [], "dedup_drop": []
@@ -108,10 +135,25 @@ async def price_compare_full(inp: CompareFullInput, ctx: Dict[str, Any]) -> Comp
             "parsed_ids": [],
             "condition_flags": []
         }
-    }
+
+    def new_diag() -> Dict[str, Any]:
+        return {
+            "domain": domain_name, "raw": 0, "round_sizes": round_sizes,
+            "provider_issues": provider_issues,
+            "kept_after_model": None, "kept_after_pricing": None, "kept_after_accessory": None,
+            "kept_after_dedup": None, "final": None,
+            "reasons": {
+                "model_mismatch": 0, "installment_only": 0, "accessory": 0,
+                "missing_required": 0, "missing_price": 0, "condition_bad": 0
+            },
+            "fallbacks": [],
+            "auto_detect": {"score": auto_score, "evidence": auto_ev} if auto_ev else {},
+            "debug": new_debug(),
+            "entity": entities,
+        }
 
     def rec_stage(bucket: str, title: str, d: Dict[str, Any], reason: str = ""):
-        if not DEBUG: return
+        if not RECORD: return
         diag["debug"]["stage_records"][bucket].append({
             "title": title[:160],
             "provider": str(d.get("provider") or d.get("source") or "unknown"),
@@ -119,170 +161,360 @@ async def price_compare_full(inp: CompareFullInput, ctx: Dict[str, Any]) -> Comp
         })
 
     def rec_keep(stage: str, title: str, d: Dict[str, Any]):
-        if not DEBUG: return
+        if not RECORD: return
         diag["debug"]["kept_titles"][stage].append({
             "title": title[:160],
             "provider": str(d.get("provider") or d.get("source") or "unknown")
         })
 
-    # 实体
-    entities = prof.entity_extract(inp.text)
-    diag["entity"] = entities
+    clock = time.perf_counter
+
+    def observe(stage: str, seconds: float, n_in: int, n_out: int):
+        # 阶段耗时 / 通过率（按 domain 跨请求聚合，/metrics 抓取）
+        stage_metrics.observe(domain_name, stage, seconds, n_in, n_out)
+
+    total_cost = rank_key("best_total_cost")
+
+    def finish(items: List[CompareItem]) -> CompareFullOutput:
+        # 流式/批量两个出口统一按总价（价格+运费+税）排序，结果与到达顺序无关
+        items = top_k(items, None, "best_total_cost")
+        if SAMPLED:
+            diag_ring.record(inp.text, dict(diag), items=len(items))
+            if not DEBUG:
+                diag["debug"] = new_debug()
+        return CompareFullOutput(items=items, diagnostics=diag)
+
+    def to_item(d: ItemFeatures, price) -> CompareItem:
+        return CompareItem(
+            title=d.title,
+            url=d.url,
+            currency=str(d.get("currency") or inp.currency or "AUD"),
+            price=_to_float(price) if price is not None else 0.0,
+            shipping=_to_float(d.get("shipping")),
+            tax=_to_float(d.get("tax")),
+            provider=str(d.get("provider") or d.get("source") or "unknown"),
+        )
+
+    # 抓取
+    all_raw, round_sizes, provider_issues = [], [], []
+    feats: List[ItemFeatures] = []
+    diag: Dict[str, Any] = new_diag()
+
+    def note_issues(q_text: str, timed_out, failed):
+        if timed_out or failed:
+            provider_issues.append({"query": q_text[:80], "timed_out": list(timed_out), "failed": dict(failed)})
+
+    async def fetch_round(q_text: str) -> CompareResult:
+        q = CompareQuery(text=q_text, region=inp.region, currency=inp.currency, prefs=prefs)
+        return await orc.run(q)
+
+    def take_round(q_text: str, res: CompareResult):
+        round_sizes.append(len(res.items))
+        all_raw.extend(res.items)
+        note_issues(q_text, getattr(res, "timed_out", None) or [], getattr(res, "failed", None) or {})
+        dbg(f"query='{q_text[:80]}...' -> got {len(res.items)}")
+
+    async def run_query(q_text: str):
+        take_round(q_text, await fetch_round(q_text))
+
+    async def run_rounds_concurrently(width: int):
+        """
+        最多 width 轮并发；结果按查询顺序合并（与串行一致）：
+        已完成的前缀轮次累计达到 MIN_RESULTS 时，取消其后仍在进行的轮次。
+        """
+        tasks: Dict[int, asyncio.Task] = {}
+        results: Dict[int, asyncio.Task] = {}
+        next_idx, taken = 0, 0
+        try:
+            while taken < len(queries):
+                while next_idx < len(queries) and len(tasks) < width:
+                    tasks[next_idx] = asyncio.ensure_future(fetch_round(queries[next_idx]))
+                    next_idx += 1
+                done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+                for i in [i for i, t in tasks.items() if t in done]:
+                    results[i] = tasks.pop(i)
+                while taken in results:
+                    # 异常也按顺序抛出：排在前面的轮次已凑够时，后面轮次的错误不影响结果
+                    take_round(queries[taken], results.pop(taken).result())
+                    taken += 1
+                    if len(all_raw) >= MIN_RESULTS:
+                        return
+        finally:
+            for t in tasks.values():
+                t.cancel()
+            if tasks:
+                dbg(f"cancelled {len(tasks)} outstanding query rounds")
+
+    stream_obs: List[tuple] = []
+
+    async def stream_rounds() -> List[CompareItem]:
+        """
+        流式：provider 一返回就对其条目增量跑 canonical 去重 → A(严格)→B→C→D，
+        通过的条目达到 MIN_RESULTS 即关闭流（取消仍在进行的 provider 请求）。
+        两级去重都保留总价更低的一条，结果与到达顺序无关；排序由 finish() 统一完成。
+        """
+        kept = {"A": 0, "B": 0, "C": 0}
+        spent = {"model": 0.0, "pricing": 0.0, "accessory": 0.0, "dedup": 0.0}
+        n_raw = 0
+        out: Dict[Any, tuple] = {}   # profile dedup key → (CompareItem, canonical_key)
+        for q_text in queries:
+            q = CompareQuery(text=q_text, region=inp.region, currency=inp.currency, prefs=prefs)
+            issues: Dict[str, Any] = {}
+            got = 0
+            # 本轮的 canonical 去重（同批量路径 orc.run：同款只留总价最低的一条再过滤）
+            canon: Dict[str, tuple] = {}   # canonical_key → (total_cost, 占用的 dedup key)
+            async with aclosing(orc.stream(q, issues=issues)) as items_stream:
+                async for it in items_stream:
+                    got += 1
+                    all_raw.append(it)
+                    f = ItemFeatures.of(it)
+                    feats.append(f)
+                    ck = canonical_key(it)
+                    prev = canon.get(ck)
+                    if prev is not None:
+                        if it.total_cost >= prev[0]:
+                            rec_stage("dedup_drop", f.title, f, "canonical"); continue
+                        # 更便宜的同款后到：撤下先前入选的那条，由这条重新走过滤
+                        held = out.get(prev[1]) if prev[1] is not None else None
+                        if held is not None and held[1] == ck:
+                            del out[prev[1]]
+                    canon[ck] = (it.total_cost, None)
+                    n_raw += 1
+                    if not f.title or not f.url:
+                        diag["reasons"]["missing_required"] += 1
+                        rec_stage("model_drop", "(missing-title/url)", f, "missing_required")
+                        continue
+                    t = clock(); passed = prof.filter_model(f, entities, strict=True); spent["model"] += clock() - t
+                    if not passed:
+                        diag["reasons"]["model_mismatch"] += 1
+                        rec_stage("model_drop", f.title, f, "strict_model_mismatch")
+                        continue
+                    kept["A"] += 1; rec_keep("A", f.title, f)
+                    t = clock(); ok, price, reason = price_of(prof, f); spent["pricing"] += clock() - t
+                    if not ok:
+                        bucket = reason if reason in ("installment_only", "condition_bad") else "missing_price"
+                        diag["reasons"][bucket] += 1
+                        rec_stage("pricing_drop", f.title, f, bucket)
+                        continue
+                    kept["B"] += 1; rec_keep("B", f.title, f)
+                    t = clock(); passed = prof.keep_after_accessory(f, is_accessory_intent=is_accessory_intent)
+                    spent["accessory"] += clock() - t
+                    if not passed:
+                        diag["reasons"]["accessory"] += 1
+                        rec_stage("accessory_drop", f.title, f)
+                        continue
+                    kept["C"] += 1; rec_keep("C", f.title, f)
+                    t = clock(); key = dedup_key_of(prof, f, entities); spent["dedup"] += clock() - t
+                    item = to_item(f, price)
+                    held = out.get(key)
+                    # 同款保留总价更低的一条（与批量路径一致，不取决于哪个 provider 先返回）
+                    if held is not None and not total_cost(item) < total_cost(held[0]):
+                        rec_stage("dedup_drop", f.title, f); continue
+                    out[key] = (item, ck); canon[ck] = (it.total_cost, key)
+                    rec_keep("D", f.title, f)
+                    if len(out) >= MIN_RESULTS:
+                        break
+            round_sizes.append(got)
+            note_issues(q_text, issues.get("timed_out") or [], issues.get("failed") or {})
+            dbg(f"stream query='{q_text[:80]}...' -> got {got}, passed {len(out)}")
+            if len(out) >= MIN_RESULTS:
+                break
+        diag.update({"kept_after_model": kept["A"], "kept_after_pricing": kept["B"],
+                     "kept_after_accessory": kept["C"], "kept_after_dedup": len(out), "final": len(out)})
+        # 只在提前结束时上报；回退到批量路径时由批量阶段统一上报（避免同一请求重复计数）
+        stream_obs[:] = [("model", spent["model"], n_raw, kept["A"]),
+                         ("pricing", spent["pricing"], kept["A"], kept["B"]),
+                         ("accessory", spent["accessory"], kept["B"], kept["C"]),
+                         ("dedup", spent["dedup"], kept["C"], len(out))]
+        return [item for item, _ in out.values()]
+
+    if _compare_stream_enabled(prefs):
+        streamed = await stream_rounds()
+        diag["raw"] = len(all_raw)
+        diag["stream"] = "early_exit"
+        if len(streamed) >= MIN_RESULTS:
+            dbg("stream early exit: D kept =", len(streamed))
+            for args in stream_obs:
+                observe(*args)
+            return finish(streamed)
+        # 流式严格路径不足 → 用已抓到的全部原始条目回退到批量路径（含宽松/软评分补位）
+        diag = new_diag()
+        diag["stream"] = "fallback"
+    else:
+        width = _query_round_width(prefs)
+        if width > 1 and len(queries) > 1:
+            await run_rounds_concurrently(width)
+        else:
+            for q_text in queries:
+                await run_query(q_text)
+                if len(all_raw) >= MIN_RESULTS:
+                    break
+
+    diag["raw"] = len(all_raw)
     dbg("entity =", entities, "| raw =", len(all_raw))
 
+    # 每条原始结果的特征记录只建一次（流式阶段已建好的直接复用），各阶段/回退共用
+    feats.extend(ItemFeatures.of(it) for it in all_raw[len(feats):])
+
     # A：型号守门
-    kept_a: List[tuple] = []
-    for it in all_raw:
-        d = it.model_dump() if hasattr(it, "model_dump") else it.dict()
-        url = str(d.get("url") or "https://example.com/unknown")
-        title = str(_first_nonempty(d, "title", "name") or "").strip()
-        if not title or not url:
+    t0 = clock()
+    kept_a: List[ItemFeatures] = []
+    for f in feats:
+        if not f.title or not f.url:
             diag["reasons"]["missing_required"] += 1
-            rec_stage("model_drop", "(missing-title/url)", d, "missing_required")
+            rec_stage("model_drop", "(missing-title/url)", f, "missing_required")
             continue
-        if not prof.filter_model(d, entities, strict=True):
+        if not prof.filter_model(f, entities, strict=True):
             diag["reasons"]["model_mismatch"] += 1
-            rec_stage("model_drop", title, d, "strict_model_mismatch")
+            rec_stage("model_drop", f.title, f, "strict_model_mismatch")
             continue
-        kept_a.append((d, title, url))
-        rec_keep("A", title, d)
+        kept_a.append(f)
+        rec_keep("A", f.title, f)
+    observe("model", clock() - t0, len(feats), len(kept_a))
 
     # 仍不足 → 宽松守门
     if len(kept_a) < MIN_RESULTS and "relax_model_suffix" in prof.fallback_plan():
         diag["fallbacks"].append("relax_model_suffix")
+        t0 = clock()
         tmp = []
-        for it in all_raw:
-            d = it.model_dump() if hasattr(it, "model_dump") else it.dict()
-            url = str(d.get("url") or "https://example.com/unknown")
-            title = str(_first_nonempty(d, "title", "name") or "").strip()
-            if not title or not url:
+        for f in feats:
+            if not f.title or not f.url:
                 continue
-            if not prof.filter_model(d, entities, strict=False):
-                rec_stage("model_drop", title, d, "relax_model_mismatch")
+            if not prof.filter_model(f, entities, strict=False):
+                rec_stage("model_drop", f.title, f, "relax_model_mismatch")
                 continue
-            tmp.append((d, title, url)); rec_keep("A", title, d)
+            tmp.append(f); rec_keep("A", f.title, f)
         kept_a = tmp
+        observe("relax", clock() - t0, len(feats), len(tmp))
 
     # 手机域：软评分补位
     if domain_name == "electronics_phone" and len(kept_a) < MIN_RESULTS and "softscore_relax_suffix" in prof.fallback_plan():
         diag["fallbacks"].append("softscore_relax_suffix")
+        t0 = clock(); n_before = len(kept_a)
         cands: List[tuple] = []
-        for it in all_raw:
-            d = it.model_dump() if hasattr(it, "model_dump") else it.dict()
-            url = str(d.get("url") or "https://example.com/unknown")
-            title = str(_first_nonempty(d, "title", "name") or "").strip()
-            if not title or not url:
+        fam = entities.get("family"); gen = entities.get("gen")
+        for f in feats:
+            if not f.title or not f.url:
                 continue
-            t = (title + " " + str(d.get("subtitle") or "")).lower()
-            fam = entities.get("family"); gen = entities.get("gen")
+            t = lower_blob(f, "title", "subtitle")
             fam_ok = (fam in t) if fam else True
             gen_ok = True
             if gen:
                 if "iphone" in t:
-                    gen_ok = bool(re.search(rf"\biphone\s*{re.escape(gen)}\b", t))
+                    gen_ok = bool(gen_rx(entities, "iphone").search(t))
                 elif "galaxy" in t:
-                    gen_ok = bool(re.search(rf"\bs\s*-?\s*{re.escape(gen)}\b", t))
+                    gen_ok = bool(gen_rx(entities, "galaxy").search(t))
             if fam_ok and gen_ok:
-                ok, price, reason = prof.normalize_price(d)
-                score = prof.soft_score(d, entities, ok)
-                cands.append((score, d, title, url, price if ok else None, reason if not ok else None))
+                ok, price, reason = price_of(prof, f)
+                score = prof.soft_score(f, entities, ok)
+                cands.append((score, f))
         cands.sort(key=lambda x: x[0], reverse=True)
-        seen_keys = {prof.dedup_key(t, d, entities) for d, t, _ in [(a[0], a[1], a[2]) for a in kept_a]} if kept_a else set()
-        for sc, d, title, url, price, reason in cands:
-            key = prof.dedup_key(title, d, entities)
+        seen_keys = {dedup_key_of(prof, f, entities) for f in kept_a}
+        for sc, f in cands:
+            key = dedup_key_of(prof, f, entities)
             if key in seen_keys: continue
-            kept_a.append((d, title, url)); seen_keys.add(key); rec_keep("A", title, d)
+            kept_a.append(f); seen_keys.add(key); rec_keep("A", f.title, f)
             if len(kept_a) >= MIN_RESULTS: break
+        observe("softscore", clock() - t0, len(cands), len(kept_a) - n_before)
 
     diag["kept_after_model"] = len(kept_a)
     dbg("A kept =", len(kept_a))
 
     # B：价格口径
+    t0 = clock()
     kept_b: List[tuple] = []
     installment_pool: List[tuple] = []
     missing_price_pool: List[tuple] = []
-    for d, title, url in kept_a:
-        ok, price, reason = prof.normalize_price(d)
+    for f in kept_a:
+        ok, price, reason = price_of(prof, f)
         if not ok:
             if reason == "installment_only":
-                diag["reasons"]["installment_only"] += 1; installment_pool.append((d, title, url, None))
-                rec_stage("pricing_drop", title, d, "installment_only")
+                diag["reasons"]["installment_only"] += 1; installment_pool.append((f, None))
+                rec_stage("pricing_drop", f.title, f, "installment_only")
             elif reason == "condition_bad":
                 diag["reasons"]["condition_bad"] += 1
-                rec_stage("pricing_drop", title, d, "condition_bad")
+                rec_stage("pricing_drop", f.title, f, "condition_bad")
             else:
-                diag["reasons"]["missing_price"] += 1; missing_price_pool.append((d, title, url, None))
-                rec_stage("pricing_drop", title, d, "missing_price")
+                diag["reasons"]["missing_price"] += 1; missing_price_pool.append((f, None))
+                rec_stage("pricing_drop", f.title, f, "missing_price")
             continue
-        kept_b.append((d, title, url, price)); rec_keep("B", title, d)
+        kept_b.append((f, price)); rec_keep("B", f.title, f)
 
         # Debug：记录成色/分期标志
-        if DEBUG:
+        if RECORD:
             diag["debug"]["condition_flags"].append({
-                "title": title[:160],
+                "title": f.title[:160],
                 "is_installment": False,
                 "is_refurb_or_used": False
             })
 
+    observe("pricing", clock() - t0, len(kept_a), len(kept_b))
     diag["kept_after_pricing"] = len(kept_b)
     dbg("B kept =", len(kept_b))
 
     # C：配件过滤
+    t0 = clock()
     kept_c: List[tuple] = []
-    for d, title, url, price in kept_b:
-        if not prof.keep_after_accessory(d, is_accessory_intent=is_accessory_intent):
+    for f, price in kept_b:
+        if not prof.keep_after_accessory(f, is_accessory_intent=is_accessory_intent):
             diag["reasons"]["accessory"] += 1
-            rec_stage("accessory_drop", title, d)
+            rec_stage("accessory_drop", f.title, f)
             continue
-        kept_c.append((d, title, url, price)); rec_keep("C", title, d)
+        kept_c.append((f, price)); rec_keep("C", f.title, f)
 
+    observe("accessory", clock() - t0, len(kept_b), len(kept_c))
     diag["kept_after_accessory"] = len(kept_c)
     dbg("C kept =", len(kept_c))
 
-    # D：去重（使用 phone_profile 的 dedup_key，并记录解析到的 docids）
-    seen = set()
+    # D：去重（使用 profile 的 dedup_key，并记录解析到的 docids）
+    t0 = clock()
+    seen: Dict[Any, int] = {}
     items: List[CompareItem] = []
-    for d, title, url, price in kept_c:
-        key = prof.dedup_key(title, d, entities)
-        if DEBUG:
-            pid, offer = getattr(prof, "parse_docids")(str(d.get("url") or ""))
-            diag["debug"]["parsed_ids"].append({"title": title[:160], "productid": pid, "offer_docid": offer})
-            diag["debug"]["dedup_keys"].append({"title": title[:160], "key": key})
-        if key in seen:
-            rec_stage("dedup_drop", title, d); continue
-        seen.add(key)
-        items.append(CompareItem(
-            title=title,
-            url=url,
-            currency=str(d.get("currency") or inp.currency or "AUD"),
-            price=_to_float(price) if price is not None else 0.0,
-            shipping=_to_float(d.get("shipping")),
-            tax=_to_float(d.get("tax")),
-            provider=str(d.get("provider") or d.get("source") or "unknown"),
-        ))
-        rec_keep("D", title, d)
-
+    for f, price in kept_c:
+        key = dedup_key_of(prof, f, entities)
+        if RECORD:
+            parse_docids = getattr(prof, "parse_docids", None)
+            if parse_docids is not None:
+                pid, offer = memo(f, "docids", lambda: parse_docids(str(f.get("url") or "")))
+                diag["debug"]["parsed_ids"].append({"title": f.title[:160], "productid": pid, "offer_docid": offer})
+            diag["debug"]["dedup_keys"].append({"title": f.title[:160], "key": key})
+        item = to_item(f, price)
+        at = seen.get(key)
+        if at is not None:
+            if total_cost(item) < total_cost(items[at]):
+                items[at] = item
+            rec_stage("dedup_drop", f.title, f); continue
+        seen[key] = len(items)
+        items.append(item)
+        rec_keep("D", f.title, f)
+
+    observe("dedup", clock() - t0, len(kept_c), len(items))
     diag["kept_after_dedup"] = len(items)
     diag["final"] = len(items)
     dbg("D kept =", len(items))
 
-    return CompareFullOutput(items=items, diagnostics=diag)
+    return finish(items)
 
 # ---------------------------------------------------------
 # 多步：search / normalize / merge-rank（轻量实现）
 # ---------------------------------------------------------
 async def price_search(inp: PriceSearchInput, ctx: Dict[str, Any]) -> PriceSearchOutput:
     # 直接使用 orchestrator 抓取一轮，作为“搜索原始结果”近似
-    q = CompareQuery(text=inp.query, region="AU", currency="AUD", prefs={"providers": inp.providers})
-    res: CompareResult = await _orc.run(q)
+    # search_limit 作为 provider 抓取量（超过单页时 provider 会并发翻页）
+    # 条目保持该区域的当地币种（如 US → USD），由 normalize.fx_tax 统一换算到目标币种
+    region = inp.region or "AU"
+    local = region_currency(region)
+    q = CompareQuery(text=inp.query, region=region, currency=local,
+                     prefs={"providers": inp.providers, "max_results": max(1, int(inp.limit))})
+    res: CompareResult = await orchestrator_for(inp.providers, inp.provider_config).run(q)
 
     items: List[PriceSearchItem] = []
     for it in res.items:
-        d = it.model_dump() if hasattr(it, "model_dump") else it.dict()
+        d = item_fields(it)
         items.append(PriceSearchItem(
             title=str(d.get("title") or "")[:200],
             url=str(d.get("url") or d.get("link") or "")[:1000],
-            currency=str(d.get("currency") or "AUD"),
+            currency=str(d.get("currency") or local),
             price=_to_float(d.get("price")),
             shipping=_to_float(d.get("shipping_cost")),
             tax=_to_float(d.get("tax_cost")),
@@ -296,12 +528,18 @@ async def price_search(inp: PriceSearchInput, ctx: Dict[str, Any]) -> PriceSearc
 
 
 def _ctx_latest_items(ctx: Dict[str, Any]) -> List[dict]:
+    """
+    上游步骤的条目。Executor 只把本步的直接依赖放进 ctx：
+    顺序链时即上一步输出；多个依赖（如多 region 搜索汇合）时按步骤序号拼接。
+    """
     keys = [k for k in ctx.keys() if k.startswith("step_") and k.endswith("_output")]
     if not keys:
         return []
     keys_sorted = sorted(keys, key=lambda k: int(k.split("_")[1]))
-    last = ctx[keys_sorted[-1]]
-    raw = getattr(last, "items", None) or (last.get("items") if isinstance(last, dict) else None) or []
+    raw: List[Any] = []
+    for k in keys_sorted:
+        prev = ctx[k]
+        raw.extend(getattr(prev, "items", None) or (prev.get("items") if isinstance(prev, dict) else None) or [])
     out: List[dict] = []
     for it in raw:
         if hasattr(it, "model_dump"):
@@ -318,20 +556,36 @@ def _ctx_latest_items(ctx: Dict[str, Any]) -> List[dict]:
 
 
 def normalize_fx_tax(inp: NormalizeFxTaxInput, ctx: Dict[str, Any]) -> NormalizeFxTaxOutput:
+    # 税费取自各条的来源报价（多 region 汇合时即各自来源区域的税），随价格一起按条目币种换算；
+    # 此版没有按区域的税率表，inp.region 不参与计算（见 models.CompareQuery.region）
     prev = _ctx_latest_items(ctx)
     items: List[PriceSearchItem] = []
-    target = str(inp.target or "AUD")
+    target = str(inp.target or "AUD").upper()
+    fx = current_fx()  # 本次请求固定使用同一份快照
+    unconvertible: Dict[str, int] = {}
     for d in prev:
+        src = str(d.get("currency") or target).upper()
+        price = _to_float(d.get("price"))
+        shipping = _to_float(d.get("shipping") or d.get("shipping_cost"))
+        tax = _to_float(d.get("tax") or d.get("tax_cost"))
+        if src != target:
+            rate = fx.rate(src, target)
+            if rate is None:
+                # 快照里没有该币种：丢弃并计数（混币种结果会被 critic 整体拒绝）
+                unconvertible[src] = unconvertible.get(src, 0) + 1
+                request_stats.incr("fx.unconvertible")
+                continue
+            price, shipping, tax = round(price * rate, 2), round(shipping * rate, 2), round(tax * rate, 2)
         items.append(PriceSearchItem(
             title=str(d.get("title") or d.get("name") or "")[:200],
             url=str(d.get("url") or d.get("link") or "")[:1000],
-            currency=target,  # 简化：直接目标币种
-            price=_to_float(d.get("price")),
-            shipping=_to_float(d.get("shipping") or d.get("shipping_cost")),
-            tax=_to_float(d.get("tax") or d.get("tax_cost")),
+            currency=target,
+            price=price,
+            shipping=shipping,
+            tax=tax,
             provider=str(d.get("provider") or d.get("source") or "unknown")[:64],
         ))
-    return NormalizeFxTaxOutput(items=items)
+    return NormalizeFxTaxOutput(items=items, unconvertible=unconvertible)
 
 
 def merge_rank(inp: MergeRankInput, ctx: Dict[str, Any]) -> MergeRankOutput:
@@ -364,17 +618,13 @@ def merge_rank(inp: MergeRankInput, ctx: Dict[str, Any]) -> MergeRankOutput:
             provider=str(d.get("provider") or d.get("source") or "unknown")[:64],
         ))
 
-    if inp.strategy == "best_total_cost":
-        kept.sort(key=lambda x: (x.price + x.shipping + x.tax))
-    else:
-        kept.sort(key=lambda x: x.price)
-
-    return MergeRankOutput(items=kept)
+    # 有界堆增量取 Top-K（topk 为空时等价于全量稳定排序）
+    return MergeRankOutput(items=top_k(kept, inp.topk, inp.strategy))
 
 # ---------------------------------------------------------
 # 推荐
 # ---------------------------------------------------------
-def reco_generate(inp: RecommendInput, ctx: Dict[str, Any]) -> RecommendOutput:
+async def reco_generate(inp: RecommendInput, ctx: Dict[str, Any]) -> RecommendOutput:
     def parse_price(v: Any) -> Optional[float]:
         if v is None: return None
         if isinstance(v, (int, float)): return float(v)
@@ -384,7 +634,7 @@ def reco_generate(inp: RecommendInput, ctx: Dict[str, Any]) -> RecommendOutput:
             return float(m.group()) if m else None
         return None
 
-    rec = generate_recommendations(inp.goal)
+    rec = await generate_recommendations_async(inp.goal)
     cleaned: List[RecommendItem] = []
     for it in rec.items:
         if hasattr(it, "model_dump"): d = it.model_dump()